@@ -0,0 +1,322 @@
+"""Benchmark suite of the calculator pipeline.
+
+Generates synthetic correlated price panels of every requested size, then
+times each stage of the pipeline on them: loading the prices from local
+files, each expected returns method, each risk model, the positive
+semidefinite fix, each optimization objective, the Monte Carlo projection,
+the historical stress test and the discrete allocation.
+The records of the optimization stages also have the realised volatility,
+Sharpe ratio and concentration of their portfolio, so that Hierarchical
+Risk Parity can be compared with max_sharpe and min_volatility.
+
+Every measurement is written as one JSON line, followed by one line per
+stage with its scaling exponents (the slope of log time against log number
+of assets and log number of days), so that runs of different versions can
+be compared.
+
+Usage:
+  python -m benchmarks.run_benchmarks --assets 10 100 500 --years 1 5 \\
+      --output benchmark.jsonl
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+from pypfopt import exceptions, risk_models
+
+from portfolio_optimizer.pipeline import (estimate_expected_returns,
+                                          estimate_risk_model,
+                                          build_efficient_frontier,
+                                          build_optimizer,
+                                          run_objective,
+                                          compute_discrete_allocation,
+                                          EXPECTED_RETURN_METHODS,
+                                          RISK_MODEL_METHODS, OBJECTIVES)
+from portfolio_optimizer.price_loader import load_price_data, LocalFileBackend
+from portfolio_optimizer.price_store import PriceStore, write_price_store
+from portfolio_optimizer.rolling import (IncrementalEstimator,
+                                         MultiSpanEstimator)
+from portfolio_optimizer.frontier import max_feasible_return
+from portfolio_optimizer.resampling import resampled_weights
+from portfolio_optimizer.simulation import project_portfolio
+from portfolio_optimizer.scenarios import stress_test
+from portfolio_optimizer.synthetic import synthetic_prices, write_price_fixture
+
+# The spans compared by the multi-span stage
+MULTI_SPANS = (60, 180, 365, 500)
+
+# Bootstrap samples of the resampled max_sharpe stage, solved on every CPU
+RESAMPLES = 20
+
+# Paths of the Monte Carlo projection stages, each one year long
+SIMULATED_PATHS = 100_000
+
+# Random portfolios and windows of the stress test stage
+STRESS_PORTFOLIOS = 10_000
+STRESS_SCENARIOS = 50
+
+
+def measure(function, repeat=3, memory=True):
+  """
+  Accepts a function without arguments, the number of timed runs and
+  whether to also measure its peak memory (in one extra, untimed run, since
+  tracing allocations slows it down). Returns a dictionary of the best and
+  median wall time, the CPU time of the best run and the peak memory in
+  bytes, plus the value the function returned.
+  """
+
+  wall_times = []
+  cpu_times = []
+  for _ in range(repeat):
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    value = function()
+    wall_times.append(time.perf_counter() - wall_start)
+    cpu_times.append(time.process_time() - cpu_start)
+
+  peak_memory = None
+  if memory:
+    tracemalloc.start()
+    function()
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+  best = int(np.argmin(wall_times))
+  return {'wall_seconds': wall_times[best],
+          'median_wall_seconds': float(np.median(wall_times)),
+          'cpu_seconds': cpu_times[best],
+          'peak_memory_bytes': peak_memory}, value
+
+
+def portfolio_statistics(weights, daily_adjclose_df):
+  """
+  Accepts an OrderedDict of weights and the price dataframe. Returns a
+  dictionary of the realised annual volatility and Sharpe ratio of the
+  portfolio over the prices, its largest weight and its effective number
+  of stocks, to compare the portfolios of the optimize stages on the same
+  footing whatever their risk model.
+  """
+
+  weights = np.array([weights[ticker] for ticker in daily_adjclose_df.columns])
+  prices = daily_adjclose_df.to_numpy(dtype='float64')
+  returns = np.nan_to_num(prices[1:] / prices[:-1] - 1) @ weights
+  volatility = float(returns.std() * np.sqrt(252))
+  return {'realised_annual_volatility': volatility,
+          'realised_sharpe_ratio': float(returns.mean() * 252 / volatility),
+          'max_weight': float(weights.max()),
+          'effective_assets': float(1 / (weights ** 2).sum())}
+
+
+def git_version():
+  try:
+    return subprocess.run(['git', 'describe', '--always', '--dirty'],
+                          capture_output=True, text=True,
+                          check=True).stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+
+def get_stages(daily_adjclose_df, fixture_directory, max_exp_cov_assets):
+  """
+  Accepts the price dataframe, the directory of its price files and the
+  largest universe to run the (pairwise, O(n^2) Python loop) exponential
+  covariance on. Returns a LIST of (stage name, function) pairs in
+  pipeline order.
+  """
+
+  n_assets = daily_adjclose_df.shape[1]
+  start_date = daily_adjclose_df.index[0]
+  end_date = daily_adjclose_df.index[-1]
+  securities = list(daily_adjclose_df.columns)
+  backend = LocalFileBackend(fixture_directory)
+
+  store_directory = os.path.join(fixture_directory, 'store')
+  write_price_store(daily_adjclose_df, store_directory)
+
+  stages = [('load_prices', lambda: load_price_data(start_date, end_date,
+                                                    securities,
+                                                    backend=backend)),
+            ('load_price_store', lambda: PriceStore(store_directory)
+                                         .to_frame(securities, start_date,
+                                                   end_date))]
+  stages.append(('streaming_moments',
+                 lambda: IncrementalEstimator.from_prices(daily_adjclose_df)))
+  stages.append(('multi_span_moments',
+                 lambda: MultiSpanEstimator.from_prices(daily_adjclose_df,
+                                                        MULTI_SPANS)))
+  for method in EXPECTED_RETURN_METHODS:
+    stages.append((f'expected_returns.{method}',
+                   lambda method=method: estimate_expected_returns(
+                       daily_adjclose_df, method)))
+  for method in RISK_MODEL_METHODS:
+    if method == 'exponential' and n_assets > max_exp_cov_assets:
+      continue
+    stages.append((f'risk_model.{method}',
+                   lambda method=method: estimate_risk_model(daily_adjclose_df,
+                                                             method)))
+
+  mu = estimate_expected_returns(daily_adjclose_df, 'mean')
+  raw_covariance_matrix = risk_models.risk_matrix(
+      daily_adjclose_df, method='ledoit_wolf_constant_variance')
+  stages.append(('fix_nonpositive_semidefinite',
+                 lambda: risk_models.fix_nonpositive_semidefinite(
+                     raw_covariance_matrix)))
+  covariance_matrix = risk_models.fix_nonpositive_semidefinite(
+      raw_covariance_matrix)
+
+  # Targets sitting inside the feasible region of every synthetic panel
+  min_volatility_object = build_efficient_frontier(mu, covariance_matrix)
+  min_volatility_weights = min_volatility_object.min_volatility()
+  lowest_return, lowest_volatility, _ = \
+      min_volatility_object.portfolio_performance()
+  targets = {'target_volatility': lowest_volatility * 1.2,
+             'target_return': (lowest_return
+                               + max_feasible_return(mu)) / 2}
+  for objective in OBJECTIVES:
+    stages.append((f'optimize.{objective}',
+                   lambda objective=objective: run_objective(
+                       build_optimizer(mu, covariance_matrix,
+                                       objective=objective),
+                       objective, **targets)))
+  factor_model = estimate_risk_model(daily_adjclose_df, 'factor')
+  stages.append(('optimize.min_volatility.factor_model',
+                 lambda: run_objective(build_efficient_frontier(mu,
+                                                                factor_model),
+                                       'min_volatility')))
+
+  resampling_config = {'expected_returns': 'mean',
+                       'risk_model': 'ledoit_wolf', 'objective': 'max_sharpe'}
+  stages.append(('optimize.max_sharpe.resampled',
+                 lambda: resampled_weights(resampling_config,
+                                           daily_adjclose_df,
+                                           RESAMPLES)['weights']))
+
+  for method, block_days in (('normal', None), ('block_bootstrap', 20)):
+    stages.append((f'simulate.{method}',
+                   lambda block_days=block_days: project_portfolio(
+                       min_volatility_weights, mu, covariance_matrix,
+                       paths=SIMULATED_PATHS,
+                       daily_adjclose_df=daily_adjclose_df,
+                       block_days=block_days)))
+
+  rng = np.random.default_rng(0)
+  n_days = len(daily_adjclose_df)
+  first_days = rng.integers(0, n_days - 1, STRESS_SCENARIOS)
+  last_days = np.minimum(first_days + rng.integers(1, 64, STRESS_SCENARIOS),
+                         n_days - 1)
+  dates = daily_adjclose_df.index
+  scenarios = {f'window_{number}': (dates[first], dates[last])
+               for number, (first, last)
+               in enumerate(zip(first_days, last_days))}
+  portfolios = rng.dirichlet(np.ones(daily_adjclose_df.shape[1]),
+                             STRESS_PORTFOLIOS)
+  stages.append(('stress_test',
+                 lambda: stress_test(portfolios, daily_adjclose_df,
+                                     scenarios)))
+
+  stages.append(('discrete_allocation',
+                 lambda: compute_discrete_allocation(min_volatility_weights,
+                                                     daily_adjclose_df,
+                                                     1_000_000)))
+  return stages
+
+
+def scaling_exponents(records):
+  """
+  Accepts the LIST of measurement records. Returns a LIST of one record
+  per stage with the log-log slope of its wall time against the number of
+  assets (at the longest history) and against the number of days (at the
+  widest universe), where there are at least two sizes to compare.
+  """
+
+  summaries = []
+  for stage in dict.fromkeys(record['stage'] for record in records):
+    stage_records = [record for record in records if record['stage'] == stage]
+    summary = {'stage': stage}
+    longest = max(record['n_days'] for record in stage_records)
+    widest = max(record['n_assets'] for record in stage_records)
+    for key, fixed_key, fixed_value in (('n_assets', 'n_days', longest),
+                                        ('n_days', 'n_assets', widest)):
+      points = [(record[key], record['wall_seconds'])
+                for record in stage_records if record[fixed_key] == fixed_value]
+      if len({size for size, _ in points}) >= 2:
+        sizes, seconds = np.log(np.array(points, dtype='float64')).T
+        summary[f'scaling_exponent_{key}'] = float(np.polyfit(sizes, seconds,
+                                                              1)[0])
+    summaries.append(summary)
+
+  return summaries
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description='Benchmark every stage of'\
+                                               ' the calculator on synthetic'\
+                                               ' price panels')
+  parser.add_argument('--assets', type=int, nargs='+', default=[10, 50, 200],
+                      help='numbers of assets (default: 10 50 200)')
+  parser.add_argument('--years', type=float, nargs='+', default=[1, 5],
+                      help='years of daily bars (default: 1 5)')
+  parser.add_argument('--repeat', type=int, default=3,
+                      help='timed runs per stage, the best is kept'\
+                           ' (default: 3)')
+  parser.add_argument('--no-memory', action='store_true',
+                      help='skip the peak memory measurement')
+  parser.add_argument('--max-exp-cov-assets', type=int, default=200,
+                      help='skip the exponential covariance above this many'\
+                           ' assets (default: 200)')
+  parser.add_argument('--output', help='JSON lines file (default: stdout)')
+  args = parser.parse_args(argv)
+
+  warnings.simplefilter('ignore')
+  environment = {'version': git_version(), 'python': platform.python_version(),
+                 'machine': platform.machine(), 'cpus': os.cpu_count()}
+
+  output_file = open(args.output, 'w') if args.output else sys.stdout
+  records = []
+  try:
+    for years in args.years:
+      for n_assets in args.assets:
+        daily_adjclose_df = synthetic_prices(n_assets, years)
+        with tempfile.TemporaryDirectory() as fixture_directory:
+          write_price_fixture(daily_adjclose_df, fixture_directory)
+          for stage, function in get_stages(daily_adjclose_df,
+                                            fixture_directory,
+                                            args.max_exp_cov_assets):
+            record = {'stage': stage, 'n_assets': n_assets, 'years': years,
+                      'n_days': len(daily_adjclose_df)}
+            try:
+              measurement, weights = measure(function, args.repeat,
+                                             memory=not args.no_memory)
+            except (exceptions.OptimizationError, ValueError) as error:
+              # Large universes can defeat the solver; the failure is
+              # recorded but not used for the scaling exponents
+              record.update(error=f'{type(error).__name__}: {error}',
+                            **environment)
+            else:
+              record.update(**measurement, **environment)
+              if stage.startswith('optimize.'):
+                record.update(portfolio_statistics(weights,
+                                                   daily_adjclose_df))
+              records.append(record)
+            output_file.write(json.dumps(record) + '\n')
+            output_file.flush()
+
+    for summary in scaling_exponents(records):
+      output_file.write(json.dumps({**summary, **environment}) + '\n')
+  finally:
+    if output_file is not sys.stdout:
+      output_file.close()
+
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,102 @@
+"""Startup benchmark of the calculator.
+
+Times the import of the entry-point modules, each in a fresh interpreter
+(so that nothing is already cached in sys.modules), and checks that none of
+them loads the heavy dependencies (PyPortfolioOpt, cvxpy, scipy, the price
+downloaders) that are only imported by the functions needing them.
+
+Every measurement is written as one JSON line. The exit status is 1 when
+the median import time of a module is over the budget or when a heavy
+dependency was loaded at import, so that the check can run in CI.
+
+Usage:
+  python -m benchmarks.startup_benchmark --budget 1.0 --repeat 5
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+
+import numpy as np
+
+from benchmarks.run_benchmarks import git_version
+
+MODULES = ('portfolio_optimizer.cli', 'portfolio_optimizer.pipeline',
+           'portfolio_optimizer.calculator', 'portfolio_optimizer.service')
+
+# Only imported by the functions that need them
+HEAVY_MODULES = ('pypfopt', 'cvxpy', 'scipy', 'yfinance',
+                 'pandas_datareader')
+
+_CHILD = '''
+import sys, time, json
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+heavy = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{'seconds': seconds, 'heavy': heavy}}))
+'''
+
+
+def time_import(module, repeat=5):
+  """
+  Accepts a module name and the number of fresh interpreters to import it
+  in. Returns a dictionary of the best and median import time and of the
+  heavy modules the import loaded.
+  """
+
+  seconds, heavy = [], set()
+  for _ in range(repeat):
+    child = subprocess.run([sys.executable, '-c',
+                            _CHILD.format(module=module,
+                                          heavy=HEAVY_MODULES)],
+                           capture_output=True, text=True, check=True)
+    measurement = json.loads(child.stdout.strip().splitlines()[-1])
+    seconds.append(measurement['seconds'])
+    heavy.update(measurement['heavy'])
+
+  return {'import_seconds': min(seconds),
+          'median_import_seconds': float(np.median(seconds)),
+          'heavy_modules': sorted(heavy)}
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description='Time the import of the'\
+                                               ' calculator entry points')
+  parser.add_argument('--modules', nargs='+', default=list(MODULES),
+                      help='modules to import (default: the entry points)')
+  parser.add_argument('--repeat', type=int, default=5,
+                      help='fresh interpreters per module, the median is'\
+                           ' compared to the budget (default: 5)')
+  parser.add_argument('--budget', type=float, default=1.0,
+                      help='maximum median import time in seconds'\
+                           ' (default: 1.0)')
+  parser.add_argument('--output', help='JSON lines file (default: stdout)')
+  args = parser.parse_args(argv)
+
+  environment = {'version': git_version(), 'python': platform.python_version(),
+                 'machine': platform.machine()}
+
+  output_file = open(args.output, 'w') if args.output else sys.stdout
+  failed = False
+  try:
+    for module in args.modules:
+      measurement = time_import(module, args.repeat)
+      over_budget = measurement['median_import_seconds'] > args.budget
+      failed = failed or over_budget or bool(measurement['heavy_modules'])
+      record = {'stage': 'import', 'module': module, **measurement,
+                'budget_seconds': args.budget, 'over_budget': over_budget,
+                **environment}
+      output_file.write(json.dumps(record) + '\n')
+      output_file.flush()
+  finally:
+    if output_file is not sys.stdout:
+      output_file.close()
+
+  return 1 if failed else 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,6 @@
+"""Portfolio Optimization Calculator package.
+
+Building blocks used by the interactive calculator in
+portfolio_optimization_calculator.py. All the quantitative finance
+calculations are still performed by the PyPortfolioOpt library.
+"""
@@ -0,0 +1,5 @@
+import sys
+
+from portfolio_optimizer.cli import main
+
+sys.exit(main())
@@ -0,0 +1,203 @@
+"""Discrete allocation.
+
+Turns the optimized weights into whole numbers of shares, for one budget or
+for many budgets (e.g. every client account following the same model
+portfolio) at once.
+
+The greedy method is DiscreteAllocation.greedy_portfolio: it buys the whole
+shares each weight can afford, then spends the leftover cash one share at a
+time on the affordable stock whose weight in the shares bought so far is
+furthest below its target weight. It runs for all the budgets together with
+numpy, one share per budget per step.
+
+The fast_greedy method is an approximation of it that scales to many
+budgets and stocks: after the first round each stock is less than one share
+below its target value, so it fills the leftover cash in a single pass over
+the stocks in order of that shortfall, buying each at most once more. It
+does not re-rank the stocks after every share like greedy_portfolio does,
+so it can end up with a slightly different allocation.
+
+The lp method solves the integer program of DiscreteAllocation.lp_portfolio
+(minimize the total deviation from the target values plus the leftover
+cash), compiling it once and re-solving it for every budget.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+ALLOCATION_METHODS = ('greedy', 'fast_greedy', 'lp')
+
+
+def _greedy_shares(weights, prices, budgets):
+  # Biggest weights first, so ties go to the same stock as greedy_portfolio
+  order = np.argsort(-weights, kind='stable')
+  weights, prices = weights[order], prices[order]
+
+  shares = np.floor(budgets[:, None] * weights / prices)
+  leftover = budgets.copy()
+  for stock, price in enumerate(prices):
+    leftover -= shares[:, stock] * price
+
+  accounts = np.arange(len(budgets))
+  active = leftover > 0
+  while active.any():
+    rows = accounts[active]
+    funds = leftover[rows]
+    invested = shares[rows] * prices
+    with np.errstate(divide='ignore', invalid='ignore'):
+      deficits = weights - invested / invested.sum(axis=1, keepdims=True)
+
+    # The biggest deficit, or the next ones while it is too expensive
+    picks = np.argmax(deficits, axis=1)
+    skips = np.zeros(len(rows), dtype='int64')
+    searching = prices[picks] > funds
+    while searching.any():
+      searched = np.flatnonzero(searching)
+      deficits[searched, picks[searched]] = 0
+      picks[searched] = np.argmax(deficits[searched], axis=1)
+      give_up = (deficits[searched, picks[searched]] < 0)\
+                | (skips[searched] == 10)
+      skips[searched[~give_up]] += 1
+      searching[searched[give_up]] = False
+      searching &= prices[picks] > funds
+
+    picked_deficits = deficits[np.arange(len(rows)), picks]
+    buy = ~(picked_deficits <= 0) & (skips < 10)
+    shares[rows[buy], picks[buy]] += 1
+    leftover[rows[buy]] -= prices[picks[buy]]
+    active[rows[~buy]] = False
+    active &= leftover > 0
+
+  unsorted_shares = np.empty_like(shares)
+  unsorted_shares[:, order] = shares
+  return unsorted_shares.astype('int64'), leftover
+
+
+def _fast_greedy_shares(weights, prices, budgets):
+  target_values = budgets[:, None] * weights
+  shares = np.floor(target_values / prices)
+  leftover = budgets - shares @ prices
+
+  shortfalls = target_values - shares * prices
+  order = np.argsort(-shortfalls, axis=1, kind='stable')
+  accounts = np.arange(len(budgets))
+  cheapest_price = prices.min()
+  for position in range(len(prices)):
+    if not (leftover >= cheapest_price).any():
+      break
+    stocks = order[:, position]
+    stock_prices = prices[stocks]
+    buy = (shortfalls[accounts, stocks] > 0) & (stock_prices <= leftover)
+    shares[accounts[buy], stocks[buy]] += 1
+    leftover -= np.where(buy, stock_prices, 0.0)
+
+  return shares.astype('int64'), leftover
+
+
+def _lp_shares(weights, prices, budgets, solver=None):
+  import cvxpy as cp
+  from pypfopt import exceptions
+
+  target_values = cp.Parameter(len(prices))
+  budget = cp.Parameter(nonneg=True)
+  shares = cp.Variable(len(prices), integer=True)
+  deviations = cp.Variable(len(prices))
+
+  leftover = budget - prices @ shares
+  deviation = target_values - cp.multiply(shares, prices)
+  problem = cp.Problem(cp.Minimize(cp.sum(deviations) + leftover),
+                       [deviation <= deviations, deviation >= -deviations,
+                        shares >= 0, leftover >= 0])
+
+  all_shares = np.zeros((len(budgets), len(prices)), dtype='int64')
+  for account, value in enumerate(budgets):
+    target_values.value = weights * value
+    budget.value = value
+    problem.solve(solver=solver)
+    if problem.status not in ('optimal', 'optimal_inaccurate'):
+      raise exceptions.OptimizationError('Please try the greedy allocation')
+    all_shares[account] = np.rint(shares.value)
+
+  return all_shares, budgets - all_shares @ prices
+
+
+def _long_only_shares(weights, prices, budgets, method, solver):
+  if not len(prices):
+    return np.zeros((len(budgets), 0), dtype='int64'), budgets.copy()
+  if method == 'greedy':
+    return _greedy_shares(weights, prices, budgets)
+  if method == 'fast_greedy':
+    return _fast_greedy_shares(weights, prices, budgets)
+  return _lp_shares(weights, prices, budgets, solver)
+
+
+def allocate_budgets(asset_weight_allocation, latest_prices, budgets,
+                     method='greedy', solver=None, chunk_size=4096):
+  """
+  Accepts the weights (a dictionary or pandas Series of tickers), a pandas
+  Series of their latest prices, a LIST, array or pandas Series of budgets
+  and the allocation method ('greedy', 'fast_greedy' or 'lp', with an
+  optional cvxpy solver supporting integer programs). Returns a tuple of a
+  pandas dataframe of the number of shares of each ticker (one row per
+  budget) and a numpy array of the money left over from each budget.
+
+  Like PyPortfolioOpt, short positions are allocated separately, from a
+  short budget of the total short weight times the budget. The greedy
+  methods work on chunk_size budgets at a time to bound their memory use.
+  """
+
+  if method not in ALLOCATION_METHODS:
+    raise ValueError(f"Unknown allocation method '{method}', expected one of"
+                     f" {ALLOCATION_METHODS}")
+
+  weights = pd.Series(asset_weight_allocation, dtype='float64')
+  tickers = list(weights.index)
+  prices = pd.Series(latest_prices)[tickers].to_numpy(dtype='float64')
+  index = budgets.index if isinstance(budgets, pd.Series) else None
+  budgets = np.asarray(budgets, dtype='float64').ravel()
+  weights = weights.to_numpy()
+
+  shares = np.zeros((len(budgets), len(tickers)), dtype='int64')
+  leftover = np.zeros(len(budgets))
+  longs, shorts = weights > 0, weights < 0
+  short_ratio = -weights[shorts].sum()
+  if shorts.any():
+    sides = ((longs, weights[longs] / weights[longs].sum(), budgets, 1),
+             (shorts, weights[shorts] / weights[shorts].sum(),
+              budgets * short_ratio, -1))
+  else:
+    sides = ((longs, weights[longs], budgets, 1),)
+
+  step = chunk_size if method != 'lp' else len(budgets)
+  for side, side_weights, side_budgets, sign in sides:
+    for start in range(0, len(budgets), max(step, 1)):
+      rows = slice(start, start + step)
+      side_shares, side_leftover = _long_only_shares(
+          side_weights, prices[side], side_budgets[rows], method, solver)
+      shares[rows, side] = sign * side_shares
+      leftover[rows] += side_leftover
+
+  return pd.DataFrame(shares, index=index, columns=tickers), leftover
+
+
+def allocate(asset_weight_allocation, latest_prices, total_portfolio_value,
+             method='greedy', solver=None):
+  """
+  Accepts the weights, a pandas Series of the latest prices, the FLOAT
+  total portfolio value and the allocation method. Returns a tuple of an
+  OrderedDict of (KEYS) ticker symbols and (VALUES) INT number of shares,
+  biggest weights first and without the tickers getting no shares, and the
+  FLOAT money left over, like DiscreteAllocation does.
+  """
+
+  shares, leftover = allocate_budgets(asset_weight_allocation, latest_prices,
+                                      [total_portfolio_value], method, solver)
+  shares = shares.iloc[0]
+  weights = pd.Series(asset_weight_allocation, dtype='float64')
+  tickers = weights.sort_values(ascending=False, kind='stable').index
+
+  return OrderedDict((ticker, int(number_of_stock))
+                     for ticker, number_of_stock in shares[tickers].items()
+                     if number_of_stock != 0), float(leftover[0])
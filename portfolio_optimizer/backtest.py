@@ -0,0 +1,181 @@
+"""Walk-forward backtest.
+
+Rolls the estimation window through the price history and, at every
+rebalance date, re-runs the calculator (expected returns, risk model,
+optimization and discrete allocation) on the window ending that day.
+Tracks the realised value of the portfolio, its turnover and drawdown.
+
+The estimation window is kept in an IncrementalEstimator: between
+rebalances the new days of returns are added to its sums and the days
+that left the window are removed, so the mean, EMA and CAPM (against the
+equally weighted market) expected returns and the sample, exponential and
+Ledoit-Wolf covariance matrices never go back over the whole window. Only
+the CAPM against a benchmark and the factor risk model are recomputed from
+the window at each rebalance.
+"""
+
+import numpy as np
+import pandas as pd
+
+from portfolio_optimizer.pipeline import (estimate_expected_returns,
+                                          estimate_risk_model,
+                                          load_market_prices,
+                                          load_factor_returns,
+                                          build_optimizer,
+                                          run_objective,
+                                          compute_discrete_allocation,
+                                          parse_weight_bounds)
+from portfolio_optimizer.rolling import IncrementalEstimator
+
+
+def get_rebalance_days(dates, lookback, rebalance):
+  """
+  Accepts the DatetimeIndex of the prices, the number of days in the
+  estimation window and the rebalance frequency: 'monthly' (the last
+  trading day of every month) or an INT number of trading days. Returns a
+  LIST of the row numbers to rebalance on, the first one being the first
+  day with a full estimation window.
+  """
+
+  if rebalance == 'monthly':
+    months = dates.to_period('M')
+    month_ends = np.flatnonzero(months[:-1] != months[1:])
+    rebalance_days = [day for day in month_ends if day > lookback]
+  else:
+    rebalance_days = list(range(lookback + int(rebalance), len(dates),
+                                int(rebalance)))
+
+  return [lookback] + rebalance_days
+
+
+def backtest(daily_adjclose_df, config, lookback=756, rebalance='monthly'):
+  """
+  Accepts the price dataframe, a config dictionary (the same keys as
+  optimize_portfolio; total_portfolio_value is the starting fund), the
+  number of trading days in the estimation window and the rebalance
+  frequency ('monthly' or an INT number of trading days).
+
+  Returns a dictionary with the daily portfolio 'values' and 'drawdown'
+  (pandas Series from the first rebalance on), a 'rebalances' dataframe of
+  the value, turnover and leftover cash at each rebalance (and the error if
+  the optimization failed, in which case the holdings are kept), and a
+  'summary' dictionary.
+  """
+
+  prices_df = daily_adjclose_df.ffill().dropna()
+  if len(prices_df) <= lookback + 1:
+    raise ValueError(f'Need more than {lookback + 1} days of complete prices'\
+                     f' to backtest, got {len(prices_df)}')
+
+  tickers = list(prices_df.columns)
+  dates = prices_df.index
+  prices = prices_df.to_numpy(dtype='float64')
+  log_returns = bool(config.get('log_returns', False))
+  # returns[day - 1] is the return earned on row day of the prices, as a log
+  # return with log_returns like the estimators of optimize_portfolio
+  returns = prices[1:] / prices[:-1] - 1
+  if log_returns:
+    returns = np.log1p(returns)
+
+  expected_returns_method = config.get('expected_returns', 'mean')
+  risk_model_method = config.get('risk_model', 'ledoit_wolf')
+  weight_bounds = parse_weight_bounds(config.get('weight_bounds'))
+  risk_free_rate = float(config.get('risk_free_rate', 0.0))
+  objective = config.get('objective', 'max_sharpe')
+  returns_span = int(config.get('returns_span', 500))
+  covariance_span = int(config.get('covariance_span', 180))
+  n_factors = int(config.get('factors', 20))
+  factor_returns = (load_factor_returns(config)
+                    if risk_model_method == 'factor' else None)
+  market_prices = (load_market_prices(config)
+                   if expected_returns_method == 'capm' else None)
+
+  incremental_returns = (expected_returns_method != 'capm'
+                         or market_prices is None)
+  incremental_risk = risk_model_method != 'factor'
+  window_estimator = None
+  if incremental_returns or incremental_risk:
+    window_estimator = IncrementalEstimator(tickers, returns_span,
+                                            covariance_span,
+                                            log_returns=log_returns)
+  window_start = window_end = 0
+
+  cash = float(config['total_portfolio_value'])
+  shares = np.zeros(len(tickers))
+  values = np.empty(len(dates))
+  rebalance_rows = []
+
+  rebalance_days = get_rebalance_days(dates, lookback, rebalance)
+  for number, day in enumerate(rebalance_days):
+    # The window holds the lookback returns ending on this day's close
+    if window_estimator is not None:
+      window_estimator.add_returns(returns[window_end:day])
+      window_estimator.remove_returns(returns[window_start:day - lookback])
+      window_start, window_end = max(window_start, day - lookback), day
+    window_df = prices_df.iloc[day - lookback:day + 1]
+
+    if expected_returns_method == 'capm' and incremental_returns:
+      mu = window_estimator.capm_return(risk_free_rate)
+    elif incremental_returns:
+      mu = window_estimator.expected_returns(expected_returns_method)
+    else:
+      mu = estimate_expected_returns(window_df, expected_returns_method,
+                                     log_returns=log_returns,
+                                     market_prices=market_prices,
+                                     risk_free_rate=risk_free_rate,
+                                     returns_span=returns_span)
+    if incremental_risk:
+      covariance_matrix = window_estimator.risk_model(risk_model_method)
+    else:
+      covariance_matrix = estimate_risk_model(window_df, risk_model_method,
+                                              log_returns=log_returns,
+                                              n_factors=n_factors,
+                                              factor_returns=factor_returns)
+
+    value = cash + shares @ prices[day]
+    row = {'date': dates[day], 'value': value, 'turnover': 0.0,
+           'leftover': cash, 'error': None}
+    try:
+      efficient_frontier_object = build_optimizer(
+          mu, covariance_matrix, weight_bounds, objective, risk_free_rate,
+          config.get('linkage', 'single'))
+      asset_weight_allocation = run_objective(
+          efficient_frontier_object, objective,
+          config.get('target_volatility'), config.get('target_return'),
+          risk_free_rate)
+      discrete_allocation, leftover = compute_discrete_allocation(
+          asset_weight_allocation, prices_df.iloc[day:day + 1], value,
+          config.get('allocation', 'greedy'))
+    except Exception as error:
+      row['error'] = f'{type(error).__name__}: {error}'
+    else:
+      new_shares = np.array([discrete_allocation.get(ticker, 0)
+                             for ticker in tickers], dtype='float64')
+      row['turnover'] = np.abs(new_shares - shares) @ prices[day] / value
+      row['leftover'] = cash = float(leftover)
+      shares = new_shares
+    rebalance_rows.append(row)
+
+    next_day = (rebalance_days[number + 1] if number + 1 < len(rebalance_days)
+                else len(dates))
+    values[day:next_day] = prices[day:next_day] @ shares + cash
+
+  values = pd.Series(values[lookback:], index=dates[lookback:], name='value')
+  drawdown = values / values.cummax() - 1
+  rebalances = pd.DataFrame(rebalance_rows)
+
+  total_return = values.iloc[-1] / values.iloc[0] - 1
+  summary = {
+      'total_return': float(total_return),
+      'annual_return': float((1 + total_return) ** (252 / max(len(values) - 1,
+                                                                1)) - 1),
+      'annual_volatility': float(values.pct_change().std() * np.sqrt(252)),
+      'max_drawdown': float(drawdown.min()),
+      # The first rebalance buys the whole portfolio, it is not turnover
+      'average_turnover': float(rebalances['turnover'].iloc[1:].mean())
+                          if len(rebalances) > 1 else 0.0,
+      'failed_rebalances': int(rebalances['error'].notna().sum()),
+  }
+
+  return {'values': values, 'drawdown': drawdown, 'rebalances': rebalances,
+          'summary': summary}
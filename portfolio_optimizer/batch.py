@@ -0,0 +1,174 @@
+"""Batch optimization.
+
+Runs a grid of calculator configurations (expected returns methods, risk
+models, objectives, budgets, weight bounds...) over the same securities and
+price history on a process pool. The price dataframe is loaded once and
+shared with the worker processes through shared memory instead of being
+pickled for every task.
+"""
+
+import csv
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from portfolio_optimizer.pipeline import optimize_portfolio, load_prices
+
+RESULT_COLUMNS = ('run', 'expected_returns', 'risk_model', 'objective',
+                  'total_portfolio_value', 'weight_bounds',
+                  'target_volatility', 'target_return',
+                  'expected_annual_return', 'annual_volatility',
+                  'sharpe_ratio', 'leftover', 'weights',
+                  'discrete_allocation', 'error')
+
+# Keys that would need a different price dataframe, so cannot vary in a batch
+PRICE_KEYS = ('securities', 'start_date', 'end_date', 'data_dir',
+              'price_store')
+
+# Set in every worker process by attach_shared_prices()
+_shared_prices = None
+_shared_memory = None
+
+
+def expand_grid(base_config, grid):
+  """
+  Accepts a base config dictionary and a grid dictionary of config keys to
+  LISTS of values. Returns a LIST of configs, one per combination of the
+  grid values.
+  """
+
+  for key in PRICE_KEYS:
+    if key in grid:
+      raise ValueError(f"'{key}' cannot be varied within one batch, all the"\
+                       " runs share the same price data")
+
+  keys = list(grid)
+  configs = []
+  for values in itertools.product(*(grid[key] for key in keys)):
+    config = dict(base_config)
+    config.update(zip(keys, values))
+    configs.append(config)
+
+  return configs
+
+
+def share_prices(daily_adjclose_df):
+  """
+  Accepts the price dataframe. Copies its values into a new shared memory
+  block. Returns the SharedMemory object and the description the worker
+  processes need to attach to it.
+  """
+
+  values = np.ascontiguousarray(daily_adjclose_df.to_numpy(dtype='float64'))
+  block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+  np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)[:] = values
+
+  description = {'name': block.name, 'shape': values.shape,
+                 'index': daily_adjclose_df.index,
+                 'columns': list(daily_adjclose_df.columns)}
+
+  return block, description
+
+
+def attach_shared_prices(description):
+  """
+  Worker process initializer. Rebuilds the price dataframe on top of the
+  shared memory block without copying it.
+  """
+
+  global _shared_prices, _shared_memory
+
+  _shared_memory = shared_memory.SharedMemory(name=description['name'])
+  values = np.ndarray(description['shape'], dtype='float64',
+                      buffer=_shared_memory.buf)
+  values.flags.writeable = False
+  _shared_prices = pd.DataFrame(values, index=description['index'],
+                                columns=description['columns'], copy=False)
+
+
+def run_config(run, config):
+  """
+  Accepts the run number and a config. Optimizes it against the shared
+  price dataframe. Returns one row of the result table as a dictionary.
+  """
+
+  row = {'run': run,
+         'expected_returns': config.get('expected_returns', 'mean'),
+         'risk_model': config.get('risk_model', 'ledoit_wolf'),
+         'objective': config.get('objective', 'max_sharpe'),
+         'total_portfolio_value': config['total_portfolio_value'],
+         'weight_bounds': json.dumps(config.get('weight_bounds')),
+         'target_volatility': config.get('target_volatility'),
+         'target_return': config.get('target_return')}
+
+  try:
+    result = optimize_portfolio(config, daily_adjclose_df=_shared_prices)
+  except Exception as error:
+    # Infeasible targets or bounds only fail their own run
+    row['error'] = f'{type(error).__name__}: {error}'
+    return row
+
+  row.update(result['performance'])
+  row['leftover'] = result['leftover']
+  row['weights'] = json.dumps(result['weights'])
+  row['discrete_allocation'] = json.dumps(result['discrete_allocation'])
+
+  return row
+
+
+def run_batch(configs, daily_adjclose_df=None, max_workers=None,
+              output_path=None):
+  """
+  Accepts a LIST of configs sharing the same securities and dates, and
+  optionally their already loaded price dataframe. Runs every config on a
+  pool of max_workers processes (one per CPU by default), appending each
+  result to the CSV file output_path as soon as it is done. Returns a
+  pandas dataframe of all the results, in the order of the configs.
+  """
+
+  if not configs:
+    return pd.DataFrame(columns=RESULT_COLUMNS)
+
+  base_config = configs[0]
+  for config in configs:
+    for key in PRICE_KEYS:
+      if config.get(key) != base_config.get(key):
+        raise ValueError(f"All the configs of a batch must share the same"\
+                         f" '{key}'")
+
+  if daily_adjclose_df is None:
+    daily_adjclose_df = load_prices(base_config)
+
+  block, description = share_prices(daily_adjclose_df)
+  output_file = None
+  rows = []
+  try:
+    if output_path:
+      output_file = open(output_path, 'w', newline='')
+      writer = csv.DictWriter(output_file, fieldnames=RESULT_COLUMNS)
+      writer.writeheader()
+
+    with ProcessPoolExecutor(max_workers=max_workers or os.cpu_count(),
+                             initializer=attach_shared_prices,
+                             initargs=(description,)) as executor:
+      futures = [executor.submit(run_config, run, config)
+                 for run, config in enumerate(configs)]
+      for future in as_completed(futures):
+        row = future.result()
+        rows.append(row)
+        if output_file:
+          writer.writerow(row)
+          output_file.flush()
+  finally:
+    if output_file:
+      output_file.close()
+    block.close()
+    block.unlink()
+
+  return (pd.DataFrame(rows, columns=RESULT_COLUMNS)
+          .sort_values('run').reset_index(drop=True))
@@ -0,0 +1,81 @@
+"""CAPM expected returns.
+
+The same estimate as expected_returns.capm_return, computed without the
+covariance matrix of every pair of stocks that it builds just to read off
+one column: each beta is the covariance of the stock with the market over
+the variance of the market, so all the betas come from sums over the days
+of the stock returns, the market returns and their products, i.e. a few
+matrix-vector products. Missing prices are handled pairwise like pandas
+does.
+
+The market is either a benchmark price series (e.g. an index ETF, loaded
+by the pipeline with the stocks and kept in memory between runs) or, by
+default, the equally weighted average of the stocks.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def _returns(prices, log_returns):
+  with np.errstate(divide='ignore', invalid='ignore'):
+    returns = prices[1:] / prices[:-1]
+    return np.log(returns) if log_returns else returns - 1
+
+
+def capm_return(daily_adjclose_df, market_prices=None, risk_free_rate=0.0,
+                frequency=252, log_returns=False, chunk_columns=1024):
+  """
+  Accepts the price dataframe and, optionally, a pandas Series of the
+  market benchmark prices and the FLOAT annual risk-free rate. Returns a
+  pandas Series of the CAPM expected return of each stock, like
+  expected_returns.capm_return. The stocks are processed chunk_columns at
+  a time to bound the memory used.
+  """
+
+  prices = daily_adjclose_df.to_numpy(dtype='float64')
+  n_days, n_stocks = len(prices) - 1, prices.shape[1]
+  chunks = [slice(start, start + chunk_columns)
+            for start in range(0, n_stocks, chunk_columns)]
+
+  # First pass: the days with at least one return (returns_from_prices
+  # drops the others) and the sums of the equally weighted market
+  returns_sum, returns_count = np.zeros(n_days), np.zeros(n_days)
+  for columns in chunks:
+    stock_returns = _returns(prices[:, columns], log_returns)
+    valid = ~np.isnan(stock_returns)
+    returns_sum += np.where(valid, stock_returns, 0.0).sum(axis=1)
+    returns_count += valid.sum(axis=1)
+  kept_days = returns_count > 0
+
+  if market_prices is None:
+    market_returns = returns_sum[kept_days] / returns_count[kept_days]
+  else:
+    market_prices = pd.Series(market_prices, dtype='float64').sort_index()
+    market_returns = pd.Series(
+        _returns(market_prices.to_numpy(), log_returns),
+        index=market_prices.index[1:]).reindex(daily_adjclose_df.index[1:])
+    market_returns = market_returns.to_numpy()[kept_days]
+
+  market_days = ~np.isnan(market_returns)
+  market = np.where(market_days, market_returns, 0.0)
+  market_variance = np.var(market_returns[market_days], ddof=1)
+  market_mean_return = (np.prod(1 + market_returns[market_days])
+                        ** (frequency / market_days.sum()) - 1)
+
+  # Second pass: the covariance of every stock with the market
+  betas = np.empty(n_stocks)
+  for columns in chunks:
+    stock_returns = _returns(prices[:, columns], log_returns)[kept_days]
+    # Only the days where both the stock and the market have a return
+    pairs = ~np.isnan(stock_returns) & market_days[:, None]
+    stock_returns = np.where(pairs, stock_returns, 0.0)
+    counts = pairs.sum(axis=0)
+    covariances = ((market @ stock_returns
+                    - (stock_returns.sum(axis=0) * (market @ pairs)) / counts)
+                   / (counts - 1))
+    betas[columns] = covariances / market_variance
+
+  return pd.Series(risk_free_rate
+                   + betas * (market_mean_return - risk_free_rate),
+                   index=daily_adjclose_df.columns)
@@ -0,0 +1,431 @@
+"""Command line entry point.
+
+Usage:
+  python -m portfolio_optimizer run config.yaml [--output result.json]
+  python -m portfolio_optimizer batch batch.yaml --output results.csv
+                                                 [--workers N]
+  python -m portfolio_optimizer frontier config.yaml --output frontier.csv
+                                                    [--points N]
+  python -m portfolio_optimizer backtest config.yaml [--lookback DAYS]
+                                  [--rebalance monthly|DAYS] [--output values.csv]
+  python -m portfolio_optimizer store config.yaml DIRECTORY [--dtype float32]
+  python -m portfolio_optimizer allocate config.yaml accounts.csv
+                                  --output shares.csv
+                                  [--method greedy|fast_greedy|lp]
+  python -m portfolio_optimizer spans config.yaml --output spans.csv
+                                  [--spans 60 180 365 500]
+  python -m portfolio_optimizer resample config.yaml [--resamples 500]
+                                  [--seed 0] [--workers N] [--output result.json]
+  python -m portfolio_optimizer simulate config.yaml [--paths 100000]
+                                  [--days 252] [--block-days DAYS] [--seed 0]
+                                  [--output result.json]
+  python -m portfolio_optimizer stress config.yaml [--scenarios scenarios.yaml]
+                                  [--portfolios frontier.csv] [--output pnl.csv]
+  python -m portfolio_optimizer results results.sqlite [--config config.yaml]
+                                  [--since DATE] [--until DATE] [--output runs.csv]
+  python -m portfolio_optimizer serve [--host 127.0.0.1] [--port 8000]
+                                  [--defaults config.yaml] [--workers N] [--threads]
+
+Instrumentation options, given before the command:
+  --instrument          log every stage as a JSON line on stderr
+  --trace-memory        also record the peak memory of every stage
+  --trace-file FILE     save the stages as a Chrome trace
+  --profile-file FILE   save cProfile statistics (see the pstats module)
+"""
+
+import argparse
+import contextlib
+import json
+import logging
+import sys
+
+import pandas as pd
+
+from portfolio_optimizer.pipeline import (load_config, optimize_portfolio,
+                                          optimize_spans)
+from portfolio_optimizer.pipeline import (load_prices, load_inputs,
+                                          parse_weight_bounds)
+from portfolio_optimizer.batch import expand_grid, run_batch
+from portfolio_optimizer.frontier import efficient_frontier_sweep
+from portfolio_optimizer.backtest import backtest
+from portfolio_optimizer.price_store import write_price_store
+from portfolio_optimizer.allocation import allocate_budgets, ALLOCATION_METHODS
+from portfolio_optimizer.resampling import (optimize_resampled,
+                                             DEFAULT_RESAMPLES)
+from portfolio_optimizer.result_store import ResultStore
+from portfolio_optimizer.simulation import project_portfolio
+from portfolio_optimizer.scenarios import parse_scenarios, stress_test
+from portfolio_optimizer.service import serve
+from portfolio_optimizer import instrumentation
+
+
+def print_result(result):
+  """
+  Accepts the result dictionary of optimize_portfolio and prints it out the
+  same way the interactive calculator does
+  """
+
+  print(f"With ${result['total_portfolio_value']:,.0f} you could buy:")
+  for ticker, number_of_stock in result['discrete_allocation'].items():
+    print(f'{number_of_stock} {ticker}')
+  print(f"and still have ${result['leftover']:.2f} left")
+
+  performance = result['performance']
+  print('Expected annual return of this portfolio:'\
+        f" {performance['expected_annual_return']*100:.1f}%")
+  print('Expected annual volatility of this portfolio:'\
+        f" {performance['annual_volatility']*100:.1f}%")
+  print(f"Sharpe Ratio: {performance['sharpe_ratio']:.2f}")
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(prog='python -m portfolio_optimizer',
+                                   description='Portfolio Optimization'\
+                                               ' Calculator')
+  parser.add_argument('--instrument', action='store_true',
+                      help='log the time spent in every stage as JSON lines'\
+                           ' on stderr')
+  parser.add_argument('--trace-memory', action='store_true',
+                      help='also record the peak memory of every stage')
+  parser.add_argument('--trace-file', help='save the stages as a Chrome'\
+                                           ' trace JSON file')
+  parser.add_argument('--profile-file', help='save cProfile statistics to'\
+                                             ' this file')
+  subparsers = parser.add_subparsers(dest='command', required=True)
+
+  run_parser = subparsers.add_parser('run', help='optimize the portfolio'\
+                                                 ' described by a config file')
+  run_parser.add_argument('config', help='YAML or JSON config file')
+  run_parser.add_argument('--output', help='also write the result to this'\
+                                           ' JSON file')
+
+  batch_parser = subparsers.add_parser('batch', help='optimize every'\
+                                                     ' combination of the'\
+                                                     " config file's 'grid'")
+  batch_parser.add_argument('config', help='YAML or JSON config file with a'\
+                                           " 'grid' of values to combine")
+  batch_parser.add_argument('--output', required=True,
+                            help='CSV file the results are streamed to')
+  batch_parser.add_argument('--workers', type=int, default=None,
+                            help='number of worker processes (default: one'\
+                                 ' per CPU)')
+
+  frontier_parser = subparsers.add_parser('frontier', help='trace the'\
+                                                           ' efficient'\
+                                                           ' frontier')
+  frontier_parser.add_argument('config', help='YAML or JSON config file')
+  frontier_parser.add_argument('--output', required=True,
+                               help='CSV file of the frontier points')
+  frontier_parser.add_argument('--points', type=int, default=50,
+                               help='number of points (default: 50)')
+
+  backtest_parser = subparsers.add_parser('backtest', help='walk-forward'\
+                                                           ' backtest of the'\
+                                                           ' config')
+  backtest_parser.add_argument('config', help='YAML or JSON config file')
+  backtest_parser.add_argument('--lookback', type=int, default=756,
+                               help='trading days in the estimation window'\
+                                    ' (default: 756)')
+  backtest_parser.add_argument('--rebalance', default='monthly',
+                               help="'monthly' or a number of trading days"\
+                                    " (default: monthly)")
+  backtest_parser.add_argument('--output', help='CSV file of the daily'\
+                                                ' portfolio values')
+
+  store_parser = subparsers.add_parser('store', help="save the config's"\
+                                                     ' prices as a memory-'\
+                                                     'mapped price store')
+  store_parser.add_argument('config', help='YAML or JSON config file')
+  store_parser.add_argument('directory', help='directory of the price store')
+  store_parser.add_argument('--dtype', choices=('float64', 'float32'),
+                            default='float64',
+                            help='dtype of the stored prices'\
+                                 ' (default: float64)')
+
+  allocate_parser = subparsers.add_parser('allocate', help='allocate the'\
+                                                           ' optimized'\
+                                                           ' portfolio to'\
+                                                           ' many accounts')
+  allocate_parser.add_argument('config', help='YAML or JSON config file')
+  allocate_parser.add_argument('accounts', help="CSV file of the accounts,"\
+                                                " with a 'budget' column")
+  allocate_parser.add_argument('--output', required=True,
+                               help='CSV file of the shares of every account')
+  allocate_parser.add_argument('--method', choices=ALLOCATION_METHODS,
+                               default='greedy',
+                               help='allocation method (default: greedy)')
+
+  spans_parser = subparsers.add_parser('spans', help='optimize with the EMA'\
+                                                     ' estimates of several'\
+                                                     ' spans')
+  spans_parser.add_argument('config', help='YAML or JSON config file')
+  spans_parser.add_argument('--spans', type=int, nargs='+',
+                            default=[60, 180, 365, 500],
+                            help='spans in days (default: 60 180 365 500)')
+  spans_parser.add_argument('--output', required=True,
+                            help='CSV file of the result of every span')
+
+  resample_parser = subparsers.add_parser('resample', help='average the'\
+                                                           ' weights over'\
+                                                           ' bootstrap'\
+                                                           ' samples of the'\
+                                                           ' prices')
+  resample_parser.add_argument('config', help='YAML or JSON config file')
+  resample_parser.add_argument('--resamples', type=int,
+                               default=DEFAULT_RESAMPLES,
+                               help='number of bootstrap samples'\
+                                    f' (default: {DEFAULT_RESAMPLES})')
+  resample_parser.add_argument('--seed', type=int, default=0,
+                               help='seed of the samples (default: 0)')
+  resample_parser.add_argument('--workers', type=int, default=None,
+                               help='number of worker processes (default:'\
+                                    ' one per CPU)')
+  resample_parser.add_argument('--output', help='also write the result to'\
+                                                ' this JSON file')
+
+  simulate_parser = subparsers.add_parser('simulate', help='project the'\
+                                                           ' optimized'\
+                                                           ' portfolio over'\
+                                                           ' simulated paths')
+  simulate_parser.add_argument('config', help='YAML or JSON config file')
+  simulate_parser.add_argument('--paths', type=int, default=100_000,
+                               help='number of paths (default: 100000)')
+  simulate_parser.add_argument('--days', type=int, default=252,
+                               help='trading days per path (default: 252)')
+  simulate_parser.add_argument('--block-days', type=int, default=None,
+                               help='bootstrap blocks of this many days of'\
+                                    ' historical returns instead of drawing'\
+                                    ' normal returns')
+  simulate_parser.add_argument('--seed', type=int, default=0,
+                               help='seed of the paths (default: 0)')
+  simulate_parser.add_argument('--output', help='also write the result and'\
+                                                ' the projection to this JSON'\
+                                                ' file')
+
+  stress_parser = subparsers.add_parser('stress', help='replay historical'\
+                                                       ' crisis windows on'\
+                                                       ' the portfolio')
+  stress_parser.add_argument('config', help='YAML or JSON config file')
+  stress_parser.add_argument('--scenarios', help='YAML or JSON file of'\
+                                                 ' scenario names and [start,'\
+                                                 ' end] dates (default: the'\
+                                                 " config's 'scenarios', or"\
+                                                 ' the built-in library)')
+  stress_parser.add_argument('--portfolios', help='CSV file of candidate'\
+                                                  ' portfolios to test as'\
+                                                  ' well, one row each with'\
+                                                  ' a column per ticker (e.g.'\
+                                                  ' the frontier output)')
+  stress_parser.add_argument('--output', help='CSV file of the P&L of every'\
+                                              ' portfolio in every scenario')
+
+  results_parser = subparsers.add_parser('results', help='list the runs of'\
+                                                         ' a result store')
+  results_parser.add_argument('store', help='SQLite result store')
+  results_parser.add_argument('--config', help='only the runs of this config')
+  results_parser.add_argument('--since', help='only the runs on or after'\
+                                              ' this date')
+  results_parser.add_argument('--until', help='only the runs on or before'\
+                                              ' this date')
+  results_parser.add_argument('--output', help='CSV file of the runs')
+
+  serve_parser = subparsers.add_parser('serve', help='serve the optimizer'\
+                                                     ' over local HTTP/JSON')
+  serve_parser.add_argument('--host', default='127.0.0.1',
+                            help='address to listen on (default: 127.0.0.1)')
+  serve_parser.add_argument('--port', type=int, default=8000,
+                            help='port to listen on (default: 8000)')
+  serve_parser.add_argument('--defaults', help='YAML or JSON config of keys'\
+                                               ' applied under every request')
+  serve_parser.add_argument('--workers', type=int,
+                            help='solver workers (default: one per CPU)')
+  serve_parser.add_argument('--threads', action='store_true',
+                            help='use worker threads instead of processes')
+
+  args = parser.parse_args(argv)
+
+  if args.instrument:
+    logging.basicConfig(format='%(message)s')
+    instrumentation.logger.setLevel(logging.INFO)
+  if args.instrument or args.trace_memory or args.trace_file:
+    instrumentation.enable(trace_memory=args.trace_memory)
+
+  with (instrumentation.profile(args.profile_file) if args.profile_file
+        else contextlib.nullcontext()):
+    run_command(args)
+
+  if args.trace_file:
+    instrumentation.write_chrome_trace(args.trace_file)
+
+  return 0
+
+
+def run_command(args):
+  if args.command == 'run':
+    result = optimize_portfolio(load_config(args.config))
+    print_result(result)
+    if args.output:
+      with open(args.output, 'w') as output_file:
+        json.dump(result, output_file, indent=2)
+  elif args.command == 'batch':
+    config = load_config(args.config)
+    grid = config.pop('grid', {})
+    results = run_batch(expand_grid(config, grid), max_workers=args.workers,
+                        output_path=args.output)
+    print(f'{len(results)} runs, {results["error"].notna().sum()} failed.'\
+          f' Results written to {args.output}')
+  elif args.command == 'frontier':
+    config = load_config(args.config)
+    _, mu, covariance_matrix = load_inputs(config)
+    frontier = efficient_frontier_sweep(
+        mu, covariance_matrix, parse_weight_bounds(config.get('weight_bounds')),
+        points=args.points,
+        risk_free_rate=float(config.get('risk_free_rate', 0.0)))
+    frontier_df = pd.DataFrame(frontier['weights'], columns=frontier['tickers'])
+    frontier_df.insert(0, 'sharpe_ratio', frontier['sharpe_ratios'])
+    frontier_df.insert(0, 'volatility', frontier['volatilities'])
+    frontier_df.insert(0, 'return', frontier['returns'])
+    frontier_df.to_csv(args.output, index=False)
+    print(f'{args.points} frontier points written to {args.output}')
+  elif args.command == 'backtest':
+    config = load_config(args.config)
+    result = backtest(load_prices(config), config, lookback=args.lookback,
+                      rebalance=args.rebalance)
+    summary = result['summary']
+    print(f"Total return: {summary['total_return']*100:.1f}%")
+    print(f"Annual return: {summary['annual_return']*100:.1f}%")
+    print(f"Annual volatility: {summary['annual_volatility']*100:.1f}%")
+    print(f"Maximum drawdown: {summary['max_drawdown']*100:.1f}%")
+    print(f"Average turnover per rebalance: "\
+          f"{summary['average_turnover']*100:.1f}%")
+    if args.output:
+      pd.DataFrame({'value': result['values'],
+                    'drawdown': result['drawdown']}).to_csv(args.output)
+  elif args.command == 'store':
+    daily_adjclose_df = load_prices(load_config(args.config))
+    write_price_store(daily_adjclose_df, args.directory, dtype=args.dtype)
+    print(f'{daily_adjclose_df.shape[0]} days of {daily_adjclose_df.shape[1]}'\
+          f' tickers written to {args.directory}')
+  elif args.command == 'allocate':
+    config = load_config(args.config)
+    daily_adjclose_df = load_prices(config)
+    result = optimize_portfolio(config, daily_adjclose_df)
+    accounts_df = pd.read_csv(args.accounts, index_col=0)
+    shares_df, leftover = allocate_budgets(
+        result['weights'], daily_adjclose_df.ffill().iloc[-1],
+        accounts_df['budget'], method=args.method)
+    shares_df['leftover'] = leftover
+    shares_df.to_csv(args.output)
+    print(f'{len(shares_df)} accounts allocated, ${leftover.sum():,.2f} left'\
+          f' over in total. Shares written to {args.output}')
+  elif args.command == 'spans':
+    results = optimize_spans(load_config(args.config), args.spans)
+    spans_df = pd.DataFrame({days: {**result['performance'],
+                                    **result['weights'],
+                                    'leftover': result['leftover']}
+                             for days, result in results.items()}).T
+    spans_df.index.name = 'span'
+    spans_df.to_csv(args.output)
+    for days, result in results.items():
+      performance = result['performance']
+      print(f"{days}-day span: return"\
+            f" {performance['expected_annual_return']*100:.1f}%, volatility"\
+            f" {performance['annual_volatility']*100:.1f}%, Sharpe ratio"\
+            f" {performance['sharpe_ratio']:.2f}")
+    print(f'{len(results)} spans written to {args.output}')
+  elif args.command == 'resample':
+    result = optimize_resampled(load_config(args.config),
+                                resamples=args.resamples, seed=args.seed,
+                                max_workers=args.workers)
+    print_result(result)
+    print(f"{result['resamples'] - result['failed_resamples']} of"\
+          f" {result['resamples']} samples solved")
+    if args.output:
+      with open(args.output, 'w') as output_file:
+        json.dump(result, output_file, indent=2)
+  elif args.command == 'simulate':
+    config = load_config(args.config)
+    daily_adjclose_df, mu, covariance_matrix = load_inputs(config)
+    result = optimize_portfolio(config, daily_adjclose_df)
+    print_result(result)
+    projection = project_portfolio(
+        result['weights'], mu, covariance_matrix,
+        result['total_portfolio_value'], paths=args.paths, days=args.days,
+        seed=args.seed, daily_adjclose_df=daily_adjclose_df,
+        block_days=args.block_days)
+    print(f"Over {projection['paths']:,} simulated paths of"\
+          f" {projection['days']} days ({projection['method']}):")
+    print(f"Median final value: ${projection['median_final_value']:,.0f}")
+    print('Probability of loss:'\
+          f" {projection['probability_of_loss']*100:.1f}%")
+    for level in (95, 99):
+      print(f'{level}% value at risk:'\
+            f" ${projection[f'value_at_risk_{level}']:,.0f}, conditional"\
+            f" value at risk:"\
+            f" ${projection[f'conditional_value_at_risk_{level}']:,.0f}")
+    print('Maximum drawdown: median'\
+          f" {projection['max_drawdown_p50']*100:.1f}%, 95th percentile"\
+          f" {projection['max_drawdown_p95']*100:.1f}%")
+    if args.output:
+      with open(args.output, 'w') as output_file:
+        json.dump({**result, 'projection': projection}, output_file,
+                  indent=2)
+  elif args.command == 'stress':
+    config = load_config(args.config)
+    scenarios_df = parse_scenarios(load_config(args.scenarios)
+                                   if args.scenarios
+                                   else config.get('scenarios'))
+    result = optimize_portfolio(config)
+    print_result(result)
+
+    weights_df = pd.DataFrame([result['weights']], index=['optimized'])
+    if args.portfolios:
+      portfolios_df = pd.read_csv(args.portfolios)
+      # Extra columns, like the returns of the frontier, are not weights
+      weights_df = pd.concat([weights_df, portfolios_df[
+          [column for column in portfolios_df.columns
+           if column in result['weights']]]])
+    # One load of the prices covering every scenario, from a few days
+    # before the earliest start, whose last trading day on or before it
+    # may be earlier (a weekend or a holiday)
+    daily_adjclose_df = load_prices(
+        {**config, 'start_date': (scenarios_df['start'].min()
+                                  - pd.Timedelta(days=10)).date(),
+         'end_date': scenarios_df['end'].max().date()})
+    stress = stress_test(weights_df, daily_adjclose_df, scenarios_df,
+                         result['total_portfolio_value'])
+
+    for name, scenario in stress['scenarios'].iterrows():
+      if pd.isna(scenario['first_date']):
+        print(f'{name}: no prices')
+        continue
+      coverage = stress['coverage'].at['optimized', name]
+      print(f"{name} ({scenario['first_date']:%Y-%m-%d} to"\
+            f" {scenario['last_date']:%Y-%m-%d}):"\
+            f" ${stress['pnl'].at['optimized', name]:,.0f}"\
+            f" ({stress['returns'].at['optimized', name]*100:.1f}%)"\
+            + (f', {coverage*100:.0f}% of the portfolio had prices'
+               if coverage < 1 else ''))
+    if args.output:
+      stress['pnl'].to_csv(args.output, index_label='portfolio')
+      print(f"{len(weights_df)} portfolios in {len(scenarios_df)} scenarios"\
+            f' written to {args.output}')
+  elif args.command == 'results':
+    config = load_config(args.config) if args.config else None
+    history_df = ResultStore(args.store).history(config, args.since,
+                                                 args.until)
+    if args.output:
+      history_df.to_csv(args.output, index=False)
+      print(f'{len(history_df)} runs written to {args.output}')
+    else:
+      print(history_df[['id', 'run_date', 'config_hash', 'objective',
+                        'expected_annual_return', 'annual_volatility',
+                        'sharpe_ratio']].to_string(index=False))
+  elif args.command == 'serve':
+    serve(args.host, args.port,
+          load_config(args.defaults) if args.defaults else None,
+          args.workers, args.threads)
+
+
+if __name__ == '__main__':
+  sys.exit(main())
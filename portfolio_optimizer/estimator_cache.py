@@ -0,0 +1,134 @@
+"""Estimator cache.
+
+Remembers the expected returns and covariance matrices already estimated
+from a given price dataframe, so that runs which only change the objective,
+the weight bounds or the budget do not estimate them again. Entries are
+keyed on a fingerprint of the price data plus the estimator and its
+parameters, kept in an in-memory LRU and optionally in a directory on disk.
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+# Bytes of prices hashed at a time
+FINGERPRINT_CHUNK_BYTES = 8 * 1024 * 1024
+
+
+def price_fingerprint(daily_adjclose_df):
+  """
+  Accepts the price dataframe. Returns a STRING that changes whenever its
+  values, dates, tickers or dtype change.
+
+  The prices are hashed in their own dtype, a chunk of rows at a time, so
+  that a memory-mapped panel (see price_store) is never copied as a whole.
+  """
+
+  digest = hashlib.blake2b(digest_size=16)
+  digest.update(repr(list(daily_adjclose_df.columns)).encode())
+  digest.update(np.ascontiguousarray(
+      daily_adjclose_df.index.to_numpy(dtype='datetime64[ns]')).tobytes())
+
+  # A view of the array behind a single-dtype dataframe
+  values = daily_adjclose_df.to_numpy()
+  digest.update(f'{values.dtype.str}{values.shape}'.encode())
+  chunk_rows = max(1, FINGERPRINT_CHUNK_BYTES
+                   // max(values.itemsize * values.shape[1], 1))
+  for start in range(0, len(values), chunk_rows):
+    # Rows of a C-ordered array are already contiguous and not copied
+    digest.update(memoryview(np.ascontiguousarray(
+        values[start:start + chunk_rows])))
+
+  return digest.hexdigest()
+
+
+def make_key(fingerprint, estimator, method, **params):
+  """
+  Accepts the price fingerprint, the kind of estimator ('expected_returns'
+  or 'risk_model'), its method and any parameters (span, frequency...).
+  Returns the STRING cache key.
+  """
+
+  params = ','.join(f'{name}={params[name]!r}' for name in sorted(params))
+  return hashlib.blake2b(f'{fingerprint}|{estimator}|{method}|{params}'
+                         .encode(), digest_size=16).hexdigest()
+
+
+class EstimatorCache:
+  """
+  LRU cache of estimated expected returns and covariance matrices holding
+  at most max_entries entries in memory. When a directory is given, every
+  entry is also pickled there so that it survives the process.
+  """
+
+  def __init__(self, max_entries=64, directory=None):
+    self.max_entries = max_entries
+    self.directory = directory
+    self._entries = OrderedDict()
+    self._lock = threading.Lock()
+    if directory:
+      os.makedirs(directory, exist_ok=True)
+
+  def get(self, key):
+    """
+    Accepts a cache key. Returns the cached value, or None.
+    """
+
+    with self._lock:
+      if key in self._entries:
+        self._entries.move_to_end(key)
+        return self._entries[key]
+
+    if self.directory:
+      path = os.path.join(self.directory, f'{key}.pkl')
+      if os.path.exists(path):
+        with open(path, 'rb') as entry_file:
+          value = pickle.load(entry_file)
+        self._remember(key, value)
+        return value
+
+    return None
+
+  def put(self, key, value):
+    self._remember(key, value)
+
+    if self.directory:
+      # Write to a temporary file first so readers never see half an entry
+      file_descriptor, temporary_path = tempfile.mkstemp(dir=self.directory)
+      with os.fdopen(file_descriptor, 'wb') as entry_file:
+        pickle.dump(value, entry_file, protocol=pickle.HIGHEST_PROTOCOL)
+      os.replace(temporary_path, os.path.join(self.directory, f'{key}.pkl'))
+
+  def clear(self):
+    with self._lock:
+      self._entries.clear()
+
+  def _remember(self, key, value):
+    with self._lock:
+      self._entries[key] = value
+      self._entries.move_to_end(key)
+      while len(self._entries) > self.max_entries:
+        self._entries.popitem(last=False)
+
+  def memoize(self, fingerprint, estimator, method, compute, **params):
+    """
+    Accepts the price fingerprint, the kind of estimator, its method, a
+    function computing the estimate and the parameters it depends on.
+    Returns a copy of the cached estimate, computing and caching it first
+    if needed.
+    """
+
+    key = make_key(fingerprint, estimator, method, **params)
+    value = self.get(key)
+    if value is None:
+      value = compute()
+      self.put(key, value)
+
+    # The optimizers should never be able to change the cached estimate
+    return value.copy()
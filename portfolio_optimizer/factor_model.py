@@ -0,0 +1,203 @@
+"""Factor risk model.
+
+A covariance matrix for very large universes, stored in factor form: the
+returns of the n stocks are explained by k << n factors, so that
+
+  covariance = loadings @ factor_covariance @ loadings.T
+               + diag(specific_variances)
+
+which takes n*k + k*k + n numbers instead of n*n. The factors are either
+statistical (the first principal components of the returns) or given by
+the user as a dataframe of factor returns (e.g. market, size, value...),
+the loadings of each stock then being its regression betas on them.
+
+The optimizer session uses the factor form directly (the variance of a
+portfolio is the squared norm of its factor exposures plus its specific
+variance), so the dense matrix never has to be built.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Specific variances are kept at least this large so that the model stays
+# positive definite
+MIN_SPECIFIC_VARIANCE = 1e-10
+
+
+def _demeaned_returns(daily_adjclose_df, log_returns):
+  prices = daily_adjclose_df.to_numpy(dtype='float64')
+  with np.errstate(divide='ignore', invalid='ignore'):
+    returns = prices[1:] / prices[:-1]
+    returns = np.log(returns) if log_returns else returns - 1
+  # Like returns_from_prices, the days without any return are dropped
+  kept_days = ~np.isnan(returns).all(axis=1)
+  returns = returns[kept_days]
+  returns -= np.nanmean(returns, axis=0)
+  # A missing return counts as an average one
+  return (np.nan_to_num(returns, nan=0.0),
+          daily_adjclose_df.index[1:][kept_days])
+
+
+class FactorRiskModel:
+  """
+  Accepts the LIST of tickers, the (stocks x factors) array of loadings,
+  the (factors x factors) factor covariance matrix and the array of
+  specific variances of the stocks, all annualised. factors optionally
+  names the factors.
+  """
+
+  def __init__(self, tickers, loadings, factor_covariance,
+               specific_variances, factors=None):
+    self.tickers = list(tickers)
+    self.loadings = np.asarray(loadings, dtype='float64')
+    self.factor_covariance = np.asarray(factor_covariance, dtype='float64')
+    self.specific_variances = np.maximum(
+        np.asarray(specific_variances, dtype='float64'), MIN_SPECIFIC_VARIANCE)
+    self.factors = (list(factors) if factors is not None
+                    else [f'factor_{number}'
+                          for number in range(self.loadings.shape[1])])
+
+    if self.loadings.shape != (len(self.tickers), len(self.factors)):
+      raise ValueError(f'Expected loadings of shape ({len(self.tickers)},'\
+                       f' {len(self.factors)}), got {self.loadings.shape}')
+
+  def __len__(self):
+    return len(self.tickers)
+
+  @property
+  def shape(self):
+    return (len(self.tickers), len(self.tickers))
+
+  def copy(self):
+    return FactorRiskModel(self.tickers, self.loadings.copy(),
+                           self.factor_covariance.copy(),
+                           self.specific_variances.copy(), self.factors)
+
+  def factor_root(self):
+    """
+    Returns the (stocks x factors) array R with R @ R.T equal to the
+    factor part of the covariance, so that the variance of weights w is
+    |R.T @ w|^2 + specific_variances @ w^2
+    """
+
+    from scipy import linalg
+
+    eigenvalues, eigenvectors = linalg.eigh(self.factor_covariance)
+    return self.loadings @ (eigenvectors * np.sqrt(np.maximum(eigenvalues,
+                                                              0.0)))
+
+  def portfolio_variances(self, weights):
+    """
+    Accepts the weights of one portfolio, or a (portfolios x stocks) array
+    of them. Returns the FLOAT variance, or an array of one per portfolio.
+    """
+
+    weights = np.asarray(weights, dtype='float64')
+    exposures = weights @ self.loadings
+    return (np.einsum('...i,ij,...j->...', exposures, self.factor_covariance,
+                      exposures)
+            + (weights ** 2) @ self.specific_variances)
+
+  def inverse_sum(self):
+    """
+    Returns the FLOAT sum of the entries of the inverse covariance matrix
+    (whose inverse square root is the volatility of the minimum variance
+    portfolio), from the Woodbury identity without building any n x n
+    matrix
+    """
+
+    from scipy import linalg
+
+    scaled_loadings = self.loadings / self.specific_variances[:, None]
+    ones = 1 / self.specific_variances
+    capacitance = (linalg.pinvh(self.factor_covariance)
+                   + self.loadings.T @ scaled_loadings)
+    projection = scaled_loadings.sum(axis=0)
+    return float(ones.sum()
+                 - projection @ linalg.solve(capacitance, projection,
+                                             assume_a='sym'))
+
+  def to_dense(self):
+    """
+    Returns the full covariance matrix as a pandas dataframe, for small
+    universes and for checks
+    """
+
+    covariance = self.loadings @ self.factor_covariance @ self.loadings.T
+    covariance[np.diag_indices_from(covariance)] += self.specific_variances
+    return pd.DataFrame(covariance, index=self.tickers, columns=self.tickers)
+
+
+def pca_factor_model(daily_adjclose_df, n_factors=20, frequency=252,
+                     log_returns=False):
+  """
+  Accepts the price dataframe and the number of statistical factors.
+  Returns a FactorRiskModel whose factors are the n_factors first principal
+  components of the returns, each stock's specific variance being the part
+  of its sample variance they do not explain.
+  """
+
+  from scipy import linalg
+
+  returns, _ = _demeaned_returns(daily_adjclose_df, log_returns)
+  n_days, n_stocks = returns.shape
+  n_factors = min(int(n_factors), n_days - 1, n_stocks)
+  if n_factors < 1:
+    raise ValueError('Need at least two days of returns for a factor model')
+
+  # Only the n_factors largest eigenpairs of the smaller of the two Gram
+  # matrices (days x days or stocks x stocks) are needed
+  if n_days < n_stocks:
+    eigenvalues, day_vectors = linalg.eigh(
+        returns @ returns.T, subset_by_index=[n_days - n_factors, n_days - 1])
+    loadings = returns.T @ day_vectors / np.sqrt(np.maximum(eigenvalues,
+                                                            1e-300))
+  else:
+    eigenvalues, loadings = linalg.eigh(
+        returns.T @ returns,
+        subset_by_index=[n_stocks - n_factors, n_stocks - 1])
+  eigenvalues, loadings = eigenvalues[::-1], loadings[:, ::-1]
+
+  factor_variances = eigenvalues / (n_days - 1) * frequency
+  total_variances = (returns ** 2).sum(axis=0) / (n_days - 1) * frequency
+  specific_variances = total_variances - (loadings ** 2) @ factor_variances
+
+  return FactorRiskModel(daily_adjclose_df.columns, loadings,
+                         np.diag(factor_variances), specific_variances)
+
+
+def regression_factor_model(daily_adjclose_df, factor_returns_df,
+                            frequency=252, log_returns=False):
+  """
+  Accepts the price dataframe and a dataframe of the daily returns of the
+  factors (one column per factor, indexed by date). Returns a
+  FactorRiskModel whose loadings are the betas of each stock on the
+  factors, over the days both have returns.
+  """
+
+  from scipy import linalg
+
+  returns, dates = _demeaned_returns(daily_adjclose_df, log_returns)
+  factor_returns_df = pd.DataFrame(factor_returns_df).sort_index()
+  factor_returns_df.index = pd.to_datetime(factor_returns_df.index)
+  common = factor_returns_df.reindex(dates).notna().all(axis=1).to_numpy()
+  if common.sum() <= factor_returns_df.shape[1] + 1:
+    raise ValueError('Not enough days with both stock and factor returns')
+
+  returns = returns[common]
+  returns -= returns.mean(axis=0)
+  factors = factor_returns_df.reindex(dates).to_numpy(dtype='float64')[common]
+  factors -= factors.mean(axis=0)
+  n_days = len(returns)
+
+  factor_covariance = factors.T @ factors / (n_days - 1)
+  loadings = linalg.solve(factors.T @ factors, factors.T @ returns,
+                          assume_a='pos').T
+  total_variances = (returns ** 2).sum(axis=0) / (n_days - 1)
+  explained_variances = np.einsum('ij,jk,ik->i', loadings, factor_covariance,
+                                  loadings)
+
+  return FactorRiskModel(daily_adjclose_df.columns, loadings,
+                         factor_covariance * frequency,
+                         (total_variances - explained_variances) * frequency,
+                         factors=factor_returns_df.columns)
@@ -0,0 +1,105 @@
+"""Efficient frontier sweep.
+
+Traces many points along the efficient frontier in one call. The
+efficient_return problem of an OptimizerSession is built and compiled
+once, with the target return as a cvxpy parameter, and re-solved for every
+target, each solve warm-started from the previous solution, instead of
+constructing a new problem for every point.
+
+The sweep uses CLARABEL unless told otherwise: OSQP's first-order
+iterations need hundreds of steps per point on a dense covariance even
+when warm-started, and miss the return target on larger universes.
+"""
+
+import numpy as np
+
+from portfolio_optimizer.factor_model import FactorRiskModel
+
+FRONTIER_SOLVER = 'CLARABEL'
+
+
+def max_feasible_return(mu, weight_bounds=None):
+  """
+  Accepts the expected returns and the weight bounds (a tuple, a list of
+  tuples or None). Returns the FLOAT highest return a fully invested
+  portfolio can reach within the bounds, by filling the best stocks first.
+  """
+
+  mu = np.asarray(mu, dtype='float64')
+  if weight_bounds is None:
+    weight_bounds = (0, 1)
+  if isinstance(weight_bounds, tuple):
+    weight_bounds = [weight_bounds] * len(mu)
+  lower_bounds = np.array([lower for lower, _ in weight_bounds], dtype='float64')
+  upper_bounds = np.array([upper for _, upper in weight_bounds], dtype='float64')
+
+  weights = lower_bounds.copy()
+  remaining = 1 - weights.sum()
+  for stock in np.argsort(-mu):
+    added = min(remaining, upper_bounds[stock] - lower_bounds[stock])
+    weights[stock] += added
+    remaining -= added
+    if remaining <= 0:
+      break
+
+  return float(weights @ mu)
+
+
+def efficient_frontier_sweep(mu, covariance_matrix, weight_bounds=None,
+                             points=50, risk_free_rate=0.0, solver=None):
+  """
+  Accepts mu, covariance_matrix, the weight bounds and the number of points
+  to trace between the minimum volatility portfolio and the highest
+  feasible return, and the name of the cvxpy solver (FRONTIER_SOLVER by
+  default). Returns a dictionary of numpy arrays: 'returns',
+  'volatilities' and 'sharpe_ratios' of length points, 'weights' of shape
+  (points, number of stocks), plus the LIST of 'tickers'. Points the solver
+  could not reach are NaN.
+  """
+
+  from pypfopt import exceptions
+
+  # The session imports this module
+  from portfolio_optimizer.session import OptimizerSession
+
+  expected = np.asarray(mu, dtype='float64')
+  session = OptimizerSession(mu, covariance_matrix, weight_bounds,
+                             gamma=0.1, solver=solver or FRONTIER_SOLVER)
+  session.min_volatility()
+  lowest_return = float(session.weights @ expected)
+
+  # Right at the highest return the problem is barely feasible and the
+  # solver may fail, so back off until it solves
+  highest_return = max_feasible_return(mu, weight_bounds)
+  return_range = max(highest_return - lowest_return, 0.0)
+  for backoff in (1e-6, 1e-5, 1e-4, 1e-3, 1e-2, 1e-1, 1.0):
+    top_return = highest_return - backoff * max(return_range, 1e-12)
+    try:
+      session.efficient_return(top_return)
+    except (exceptions.OptimizationError, ValueError):
+      continue
+    break
+  target_returns = np.linspace(lowest_return, max(top_return, lowest_return),
+                               points)
+
+  weights = np.full((points, len(expected)), np.nan)
+  for point, target_return in enumerate(target_returns):
+    try:
+      session.efficient_return(float(target_return))
+    except (exceptions.OptimizationError, ValueError):
+      continue
+    weights[point] = session.weights
+
+  returns = weights @ expected
+  if isinstance(covariance_matrix, FactorRiskModel):
+    volatilities = np.sqrt(covariance_matrix.portfolio_variances(weights))
+  else:
+    covariance = np.asarray(covariance_matrix, dtype='float64')
+    volatilities = np.sqrt(np.einsum('ij,jk,ik->i', weights, covariance,
+                                     weights))
+
+  return {'tickers': list(session.tickers),
+          'returns': returns,
+          'volatilities': volatilities,
+          'sharpe_ratios': (returns - risk_free_rate) / volatilities,
+          'weights': weights}
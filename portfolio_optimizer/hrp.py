@@ -0,0 +1,176 @@
+"""Hierarchical Risk Parity.
+
+An optimizer that needs no solver, for universes too large (or covariance
+matrices too ill-conditioned) for the quadratic programs of the efficient
+frontier. The stocks are clustered by the distance between their returns,
+sqrt((1 - correlation) / 2), and ordered along the dendrogram so that
+similar stocks sit next to each other. The weights are then split by
+recursive bisection of that order: each half gets a share of its parent's
+weight inversely proportional to its variance (with inverse-variance
+weights inside the half), as in Lopez de Prado's HRP and PyPortfolioOpt's
+HRPOpt.
+
+The weight bounds are kept by clipping each split so that both halves can
+still meet the bounds of their stocks. The clustering takes O(n^2) time
+and memory and the bisection about as much, so thousands of stocks take
+seconds.
+"""
+
+from collections import OrderedDict
+
+import numpy as np
+
+from portfolio_optimizer.factor_model import FactorRiskModel
+from portfolio_optimizer.instrumentation import span
+
+LINKAGE_METHODS = ('single', 'complete', 'average', 'ward')
+
+
+def _bound_arrays(weight_bounds, n_assets):
+  if weight_bounds is None:
+    weight_bounds = (0, 1)
+  if isinstance(weight_bounds, tuple):
+    weight_bounds = [weight_bounds] * n_assets
+  if len(weight_bounds) != n_assets:
+    raise ValueError(f'Expected weight bounds for {n_assets} stocks, got'\
+                     f' {len(weight_bounds)}')
+
+  bounds = np.array(weight_bounds, dtype='float64')
+  # HRP portfolios are long only
+  return (np.maximum(np.nan_to_num(bounds[:, 0], nan=0.0), 0.0),
+          np.nan_to_num(bounds[:, 1], nan=1.0))
+
+
+def cluster_order(covariance, linkage_method='single'):
+  """
+  Accepts the covariance matrix as a numpy array and the scipy linkage
+  method. Returns the array of stock positions in the order of the leaves
+  of the dendrogram of their correlation distances.
+  """
+
+  from scipy.cluster import hierarchy
+  from scipy.spatial import distance
+
+  if linkage_method not in LINKAGE_METHODS:
+    raise ValueError(f"Unknown linkage method '{linkage_method}', expected"\
+                     f' one of {LINKAGE_METHODS}')
+  if len(covariance) < 2:
+    return np.arange(len(covariance))
+
+  standard_deviations = np.sqrt(np.diag(covariance))
+  correlation = covariance / np.outer(standard_deviations,
+                                      standard_deviations)
+  distances = np.sqrt(np.clip((1.0 - correlation) / 2.0, 0.0, 1.0))
+  links = hierarchy.linkage(distance.squareform(distances, checks=False),
+                            linkage_method)
+  return hierarchy.leaves_list(links)
+
+
+def hrp_weights(covariance, order, weight_bounds=None):
+  """
+  Accepts the covariance matrix as a numpy array, the order of the stocks
+  (see cluster_order) and the weight bounds. Returns the numpy array of the
+  weights split by recursive bisection of that order.
+  """
+
+  n_assets = len(covariance)
+  lower_bounds, upper_bounds = _bound_arrays(weight_bounds, n_assets)
+  if lower_bounds.sum() > 1 + 1e-9 or upper_bounds.sum() < 1 - 1e-9:
+    raise ValueError('The weight bounds cannot sum to a fully invested'\
+                     ' portfolio')
+
+  # Reordered once, so that every cluster is a contiguous block
+  ordered = covariance[np.ix_(order, order)]
+  inverse_variances = 1 / np.diag(ordered)
+  # Cumulative sums give the total bound of any block in O(1)
+  lower_sums = np.concatenate([[0.0], np.cumsum(lower_bounds[order])])
+  upper_sums = np.concatenate([[0.0], np.cumsum(upper_bounds[order])])
+
+  def block_variance(start, stop):
+    weights = inverse_variances[start:stop] / inverse_variances[
+        start:stop].sum()
+    return weights @ ordered[start:stop, start:stop] @ weights
+
+  weights = np.zeros(n_assets)
+  blocks = [(0, n_assets, 1.0)]
+  while blocks:
+    start, stop, weight = blocks.pop()
+    if stop - start == 1:
+      weights[start] = weight
+      continue
+
+    middle = (start + stop) // 2
+    left_variance = block_variance(start, middle)
+    right_variance = block_variance(middle, stop)
+    left_share = 1 - left_variance / (left_variance + right_variance)
+    if weight > 0:
+      left_share = np.clip(
+          left_share,
+          max((lower_sums[middle] - lower_sums[start]) / weight,
+              1 - (upper_sums[stop] - upper_sums[middle]) / weight),
+          min((upper_sums[middle] - upper_sums[start]) / weight,
+              1 - (lower_sums[stop] - lower_sums[middle]) / weight))
+    blocks.append((start, middle, weight * left_share))
+    blocks.append((middle, stop, weight * (1 - left_share)))
+
+  result = np.empty(n_assets)
+  result[order] = weights
+  return result
+
+
+class HRPOptimizer:
+  """
+  Accepts mu, covariance_matrix (or a FactorRiskModel) and, optionally, the
+  weight bounds, the risk-free rate and the scipy linkage method. Has the
+  hrp() and portfolio_performance() methods of the other optimizers, so
+  that its weights go through the same allocation and reporting.
+  """
+
+  def __init__(self, mu, covariance_matrix, weight_bounds=None,
+               risk_free_rate=0.0, linkage_method='single'):
+    self.tickers = list(mu.index)
+    self.expected_returns = np.asarray(mu, dtype='float64')
+    if isinstance(covariance_matrix, FactorRiskModel):
+      covariance_matrix = covariance_matrix.to_dense()
+    self.cov_matrix = np.asarray(covariance_matrix, dtype='float64')
+    self.weight_bounds = weight_bounds
+    self.risk_free_rate = risk_free_rate
+    self.linkage_method = linkage_method
+    self.order = None
+    self.weights = None
+
+  def set_weight_bounds(self, weight_bounds):
+    self.weight_bounds = weight_bounds
+
+  def hrp(self):
+    """
+    Returns an OrderedDict of ticker symbols and their Hierarchical Risk
+    Parity weights
+    """
+
+    if self.order is None:
+      with span('cluster', assets=len(self.tickers),
+                linkage=self.linkage_method):
+        self.order = cluster_order(self.cov_matrix, self.linkage_method)
+    with span('recursive_bisection', assets=len(self.tickers)):
+      self.weights = hrp_weights(self.cov_matrix, self.order,
+                                 self.weight_bounds)
+    return OrderedDict(zip(self.tickers, self.weights))
+
+  def portfolio_performance(self, verbose=False, risk_free_rate=None):
+    """
+    Returns a tuple of the expected annual return, the annual volatility
+    and the Sharpe ratio of the last computed portfolio
+    """
+
+    if risk_free_rate is None:
+      risk_free_rate = self.risk_free_rate
+    expected_return = float(self.weights @ self.expected_returns)
+    volatility = float(np.sqrt(self.weights @ self.cov_matrix
+                               @ self.weights))
+    sharpe_ratio = (expected_return - risk_free_rate) / volatility
+    if verbose:
+      print(f'Expected annual return: {100 * expected_return:.1f}%')
+      print(f'Annual volatility: {100 * volatility:.1f}%')
+      print(f'Sharpe Ratio: {sharpe_ratio:.2f}')
+    return expected_return, volatility, sharpe_ratio
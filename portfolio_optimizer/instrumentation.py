@@ -0,0 +1,232 @@
+"""Instrumentation.
+
+Per-stage spans recording wall time, CPU time, peak memory and any extra
+attributes (solver iterations and status...). Spans are logged as JSON
+lines on the 'portfolio_optimizer.instrumentation' logger and can be saved
+as a Chrome trace (chrome://tracing, Perfetto). Everything is off by
+default, in which case span() returns a shared do-nothing object.
+
+Only the last MAX_RECORDS spans are kept, so that a long-running service
+with instrumentation on does not grow without bound.
+"""
+
+import cProfile
+import json
+import logging
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger('portfolio_optimizer.instrumentation')
+
+# Spans kept for get_records() and the Chrome trace, the oldest dropped first
+MAX_RECORDS = 100_000
+
+_enabled = False
+_trace_memory = False
+_records = deque(maxlen=MAX_RECORDS)
+# Spans recorded since the last clear, including the dropped ones
+_record_count = 0
+_records_lock = threading.Lock()
+_local = threading.local()
+
+
+class _NullSpan:
+  """
+  What span() returns while instrumentation is off.
+  """
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, *exc_info):
+    return False
+
+  def set(self, **attributes):
+    pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+  """
+  One timed stage. Use as a context manager; set() attaches attributes.
+  """
+
+  def __init__(self, name, attributes):
+    self.name = name
+    self.attributes = attributes
+    self.child_peak_memory = 0
+
+  def set(self, **attributes):
+    self.attributes.update(attributes)
+
+  def __enter__(self):
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+      stack = _local.stack = []
+    self.parent = stack[-1] if stack else None
+    stack.append(self)
+
+    if _trace_memory:
+      self.start_memory = tracemalloc.get_traced_memory()[0]
+      tracemalloc.reset_peak()
+    self.start = time.perf_counter()
+    self.start_cpu = time.process_time()
+    return self
+
+  def __exit__(self, exc_type, exc_value, traceback):
+    global _record_count
+
+    wall_seconds = time.perf_counter() - self.start
+    cpu_seconds = time.process_time() - self.start_cpu
+    _local.stack.pop()
+
+    record = {'name': self.name,
+              'parent': self.parent.name if self.parent else None,
+              'start': self.start, 'wall_seconds': wall_seconds,
+              'cpu_seconds': cpu_seconds, 'pid': os.getpid(),
+              'thread': threading.get_ident(), **self.attributes}
+    if exc_type is not None:
+      record['error'] = exc_type.__name__
+
+    if _trace_memory:
+      # reset_peak() is global, so nested spans hand their peaks up
+      peak_memory = max(tracemalloc.get_traced_memory()[1],
+                        self.child_peak_memory)
+      record['peak_memory_bytes'] = peak_memory - self.start_memory
+      if self.parent is not None:
+        self.parent.child_peak_memory = max(self.parent.child_peak_memory,
+                                            peak_memory)
+
+    with _records_lock:
+      _records.append(record)
+      _record_count += 1
+    if logger.isEnabledFor(logging.INFO):
+      logger.info(json.dumps(record, default=str))
+    return False
+
+
+def span(name, **attributes):
+  """
+  Accepts the name of a stage and any attributes to record with it. Returns
+  a context manager timing the stage while instrumentation is on.
+  """
+
+  if not _enabled:
+    return _NULL_SPAN
+  return Span(name, attributes)
+
+
+def enable(trace_memory=False):
+  """
+  Turns the instrumentation on, also tracing the peak memory of every span
+  (which slows the code down) if trace_memory is true.
+  """
+
+  global _enabled, _trace_memory
+
+  _enabled = True
+  _trace_memory = trace_memory
+  if trace_memory and not tracemalloc.is_tracing():
+    tracemalloc.start()
+
+
+def disable():
+  global _enabled, _trace_memory
+
+  if _trace_memory:
+    tracemalloc.stop()
+  _enabled = False
+  _trace_memory = False
+
+
+def is_enabled():
+  return _enabled
+
+
+def record_count():
+  """
+  Returns the INT number of spans recorded so far, including those no
+  longer kept, to pass to get_records() later.
+  """
+
+  return _record_count
+
+
+def get_records(since=0):
+  """
+  Accepts an optional record_count() taken earlier. Returns a LIST of the
+  dictionaries of the spans kept (the last MAX_RECORDS), or of those
+  recorded since that count.
+  """
+
+  with _records_lock:
+    records = list(_records)
+    new_records = _record_count - since
+  return records[max(len(records) - new_records, 0):]
+
+
+def clear_records():
+  global _record_count
+
+  with _records_lock:
+    _records.clear()
+    _record_count = 0
+
+
+def solver_stats(efficient_frontier_object):
+  """
+  Accepts an EfficientFrontier object that has been solved. Returns a
+  dictionary of the solver name, status, iterations and solve time.
+  """
+
+  problem = getattr(efficient_frontier_object, '_opt', None)
+  if problem is None:
+    return {}
+  stats = problem.solver_stats
+  return {'solver': stats.solver_name, 'solver_status': problem.status,
+          'solver_iterations': stats.num_iters,
+          'solver_seconds': stats.solve_time}
+
+
+def write_chrome_trace(path):
+  """
+  Accepts a file path. Writes the recorded spans there in the Chrome trace
+  event format.
+  """
+
+  events = []
+  for record in get_records():
+    arguments = {key: value for key, value in record.items()
+                 if key not in ('name', 'start', 'wall_seconds', 'pid',
+                                'thread')}
+    events.append({'name': record['name'], 'ph': 'X',
+                   'ts': record['start'] * 1e6,
+                   'dur': record['wall_seconds'] * 1e6,
+                   'pid': record['pid'], 'tid': record['thread'],
+                   'args': arguments})
+
+  with open(path, 'w') as trace_file:
+    json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, trace_file,
+              default=str)
+
+
+@contextmanager
+def profile(path):
+  """
+  Accepts a file path. Runs the body of the with statement under cProfile
+  and saves the statistics there (readable with the pstats module).
+  """
+
+  profiler = cProfile.Profile()
+  profiler.enable()
+  try:
+    yield profiler
+  finally:
+    profiler.disable()
+    profiler.dump_stats(path)
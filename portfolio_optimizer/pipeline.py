@@ -0,0 +1,705 @@
+"""Optimization pipeline.
+
+The steps of the calculator (price data, expected returns, risk model,
+efficient frontier, optimization and discrete allocation) without any
+input() prompts, so that they can be run headless from a config file or
+used as a library. The interactive calculator is one front-end for them.
+
+PyPortfolioOpt (and with it cvxpy) is only imported by the stages that
+use it, so that importing the pipeline, the command line or the
+calculator stays fast.
+"""
+
+import datetime as datetime
+import json
+import threading
+import time
+
+import pandas as pd
+
+from portfolio_optimizer.price_loader import (load_price_data, YahooBackend,
+                                              LocalFileBackend)
+from portfolio_optimizer.price_cache import (PriceCache, CachedBackend,
+                                             DEFAULT_CACHE_PATH)
+from portfolio_optimizer.price_store import PriceStore
+from portfolio_optimizer.rolling import (IncrementalEstimator,
+                                         MultiSpanEstimator)
+from portfolio_optimizer.capm import capm_return
+from portfolio_optimizer.factor_model import (FactorRiskModel,
+                                              pca_factor_model,
+                                              regression_factor_model)
+from portfolio_optimizer.hrp import HRPOptimizer
+from portfolio_optimizer.allocation import allocate
+from portfolio_optimizer.estimator_cache import (EstimatorCache,
+                                                 price_fingerprint)
+from portfolio_optimizer.result_store import ResultStore
+from portfolio_optimizer import instrumentation
+from portfolio_optimizer.instrumentation import span, solver_stats
+
+EXPECTED_RETURN_METHODS = ('mean', 'ema', 'capm')
+RISK_MODEL_METHODS = ('sample', 'exponential', 'ledoit_wolf', 'factor')
+OBJECTIVES = ('max_sharpe', 'min_volatility', 'efficient_risk',
+              'efficient_return', 'hrp')
+
+# Cached prices are re-downloaded after a week to pick up dividend and split
+# adjustments
+PRICE_CACHE_TTL = 7 * 24 * 60 * 60
+
+# Estimates shared by every run of this process, plus one cache per on-disk
+# directory asked for by 'estimator_cache_dir'
+ESTIMATOR_CACHE = EstimatorCache()
+_estimator_caches_on_disk = {}
+
+# Market benchmark prices already loaded by this process
+MARKET_PRICES = {}
+
+# Result stores opened by this process, one per 'result_store' path
+_result_stores = {}
+
+
+def shared_moments(daily_adjclose_df, log_returns=False, returns_span=500,
+                   covariance_span=180):
+  """
+  Accepts the pandas dataframe daily_adjclose_df and the spans of the EMA
+  returns and the exponential covariance. Returns a function that, on its
+  first call, feeds the prices to an IncrementalEstimator in one chunked
+  pass and returns it on every call, so that all the estimators share a
+  single conversion of the prices to returns instead of making full-size
+  copies of them once each. The function returns None when some prices are
+  missing, and the estimators then fall back to PyPortfolioOpt.
+
+  The function accepts the returns_span and covariance_span an estimator
+  needs (None when it does not depend on it), and only makes another pass
+  when they differ from those of the estimators already computed.
+  """
+
+  estimators = []
+
+  def get_moments(needed_returns_span=None, needed_covariance_span=None):
+    for incremental_estimator in estimators:
+      if incremental_estimator is None:
+        return None
+      if (needed_returns_span in (None, incremental_estimator.returns_span)
+          and needed_covariance_span in (
+              None, incremental_estimator.covariance_span)):
+        return incremental_estimator
+
+    with span('streaming_moments', days=len(daily_adjclose_df),
+              assets=daily_adjclose_df.shape[1]):
+      try:
+        incremental_estimator = IncrementalEstimator.from_prices(
+            daily_adjclose_df, log_returns=log_returns,
+            returns_span=needed_returns_span or returns_span,
+            covariance_span=needed_covariance_span or covariance_span)
+      except ValueError:
+        incremental_estimator = None
+    estimators.append(incremental_estimator)
+    return incremental_estimator
+
+  return get_moments
+
+
+def estimate_expected_returns(daily_adjclose_df, method, estimator_cache=None,
+                              fingerprint=None, log_returns=False,
+                              moments=None, market_prices=None,
+                              risk_free_rate=0.0, returns_span=500):
+  """
+  Accepts the pandas dataframe daily_adjclose_df and the name of a method
+  ('mean', 'ema' or 'capm'). Returns a pandas Series of ticker symbols and
+  their expected returns. When an EstimatorCache is given, the estimate is
+  reused if it was already computed from the same prices (identified by
+  their fingerprint, computed if not given). The returns are computed from
+  the shared_moments function if one is given. The CAPM uses the
+  market_prices Series as the market if given (see load_market_prices),
+  and the FLOAT risk_free_rate. The EMA gives more weight to the last
+  returns_span days.
+  """
+
+  if method not in EXPECTED_RETURN_METHODS:
+    raise ValueError(f"Unknown expected returns method '{method}', expected"
+                     f" one of {EXPECTED_RETURN_METHODS}")
+
+  with span('expected_returns', method=method,
+            cached=estimator_cache is not None):
+    if estimator_cache is None:
+      return _expected_returns(daily_adjclose_df, method, log_returns,
+                               moments, market_prices, risk_free_rate,
+                               returns_span)
+
+    if fingerprint is None:
+      fingerprint = price_fingerprint(daily_adjclose_df)
+    market = None
+    if method == 'capm' and market_prices is not None:
+      market = price_fingerprint(market_prices.to_frame())
+    return estimator_cache.memoize(
+        fingerprint, 'expected_returns', method,
+        lambda: _expected_returns(daily_adjclose_df, method, log_returns,
+                                  moments, market_prices, risk_free_rate,
+                                  returns_span),
+        frequency=252, log_returns=log_returns, market=market,
+        risk_free_rate=risk_free_rate if method == 'capm' else None,
+        span=returns_span if method == 'ema' else None)
+
+
+def _expected_returns(daily_adjclose_df, method, log_returns, moments,
+                      market_prices, risk_free_rate, returns_span):
+  if method == 'capm':
+    # Only needs the covariance of each stock with the market, cheaper than
+    # the shared moments
+    with span('capm_return', benchmark=market_prices is not None):
+      return capm_return(daily_adjclose_df, market_prices, risk_free_rate,
+                         log_returns=log_returns)
+
+  incremental_estimator = None
+  if moments is not None:
+    incremental_estimator = moments(
+        returns_span if method == 'ema' else None)
+  if incremental_estimator is not None:
+    return incremental_estimator.expected_returns(method)
+
+  from pypfopt import expected_returns
+
+  if method == 'mean':
+    with span('mean_historical_return'):
+      return expected_returns.mean_historical_return(daily_adjclose_df,
+                                                     log_returns=log_returns)
+  with span('ema_historical_return'):
+    return expected_returns.ema_historical_return(daily_adjclose_df,
+                                                  span=returns_span,
+                                                  log_returns=log_returns)
+
+
+def estimate_risk_model(daily_adjclose_df, method, estimator_cache=None,
+                        fingerprint=None, log_returns=False, moments=None,
+                        covariance_span=180, n_factors=20,
+                        factor_returns=None):
+  """
+  Accepts the pandas dataframe daily_adjclose_df and the name of a method
+  ('sample', 'exponential', 'ledoit_wolf' or 'factor'). Returns the
+  covariance matrix of the securities, fixed to be positive semidefinite.
+  Cached and shared like estimate_expected_returns. The exponential
+  covariance gives more weight to the last covariance_span days.
+
+  The 'factor' method returns a FactorRiskModel instead of a dense matrix:
+  the n_factors principal components of the returns, or the factors whose
+  daily returns are in the factor_returns dataframe if given.
+  """
+
+  if method not in RISK_MODEL_METHODS:
+    raise ValueError(f"Unknown risk model '{method}', expected one of"
+                     f" {RISK_MODEL_METHODS}")
+
+  with span('risk_model', method=method, cached=estimator_cache is not None):
+    if estimator_cache is None:
+      return _risk_model(daily_adjclose_df, method, log_returns, moments,
+                         covariance_span, n_factors, factor_returns)
+
+    if fingerprint is None:
+      fingerprint = price_fingerprint(daily_adjclose_df)
+    factors = None
+    if method == 'factor':
+      factors = (n_factors if factor_returns is None
+                 else price_fingerprint(factor_returns))
+    return estimator_cache.memoize(
+        fingerprint, 'risk_model', method,
+        lambda: _risk_model(daily_adjclose_df, method, log_returns, moments,
+                            covariance_span, n_factors, factor_returns),
+        frequency=252, log_returns=log_returns,
+        span=covariance_span if method == 'exponential' else None,
+        factors=factors)
+
+
+def _risk_model(daily_adjclose_df, method, log_returns, moments,
+                covariance_span, n_factors, factor_returns):
+  if method == 'factor':
+    # Never builds the dense matrix, so neither the shared moments nor the
+    # positive semidefinite fix apply
+    if factor_returns is not None:
+      with span('regression_factor_model', factors=factor_returns.shape[1]):
+        return regression_factor_model(daily_adjclose_df, factor_returns,
+                                       log_returns=log_returns)
+    with span('pca_factor_model', factors=n_factors):
+      return pca_factor_model(daily_adjclose_df, n_factors,
+                              log_returns=log_returns)
+
+  incremental_estimator = None
+  if moments is not None:
+    incremental_estimator = moments(
+        None, covariance_span if method == 'exponential' else None)
+  if incremental_estimator is not None:
+    with span('fix_nonpositive_semidefinite'):
+      return incremental_estimator.risk_model(method)
+
+  from pypfopt import risk_models
+
+  if method == 'sample':
+    with span('sample_cov'):
+      covariance_matrix = risk_models.sample_cov(daily_adjclose_df,
+                                                 log_returns=log_returns)
+  elif method == 'exponential':
+    with span('exp_cov'):
+      covariance_matrix = risk_models.exp_cov(daily_adjclose_df,
+                                              span=covariance_span,
+                                              log_returns=log_returns)
+  else:
+    with span('ledoit_wolf'):
+      covariance_matrix = risk_models.risk_matrix(
+          daily_adjclose_df, method='ledoit_wolf_constant_variance',
+          log_returns=log_returns)
+
+  with span('fix_nonpositive_semidefinite'):
+    return risk_models.fix_nonpositive_semidefinite(covariance_matrix)
+
+
+def build_efficient_frontier(mu, covariance_matrix, weight_bounds=None,
+                             solver=None):
+  """
+  Accepts mu, covariance_matrix, and list of tuples, a tuple or None, and
+  optionally the name of the cvxpy solver to use. Returns EfficientFrontier
+  object created by the PyPortfolioOpt library, or an OptimizerSession with
+  the same methods when covariance_matrix is a FactorRiskModel.
+  """
+
+  # Set default weight bound if user chooses not to set it themselves
+  if weight_bounds is None:
+    weight_bounds = (0, 1)
+
+  if isinstance(covariance_matrix, FactorRiskModel):
+    # The session imports the frontier module, which imports this one
+    from portfolio_optimizer.session import OptimizerSession
+
+    with span('build_efficient_frontier', assets=len(mu), factor_model=True):
+      return OptimizerSession(mu, covariance_matrix, weight_bounds,
+                              gamma=0.1, solver=solver)
+
+  from pypfopt import objective_functions
+  from pypfopt.efficient_frontier import EfficientFrontier
+
+  with span('build_efficient_frontier', assets=len(mu)):
+    efficient_frontier_object = EfficientFrontier(mu, covariance_matrix,
+                                                  weight_bounds, solver=solver)
+    efficient_frontier_object.add_objective(objective_functions.L2_reg,
+                                            gamma=0.1)
+
+  return efficient_frontier_object
+
+
+def build_optimizer(mu, covariance_matrix, weight_bounds=None,
+                    objective='max_sharpe', risk_free_rate=0.0,
+                    linkage_method='single', solver=None):
+  """
+  Accepts mu, covariance_matrix, the weight bounds, the name of the
+  objective, the risk-free rate, the linkage method of the 'hrp' objective
+  and the name of the cvxpy solver. Returns the HRPOptimizer for 'hrp',
+  which needs no solver, or build_efficient_frontier's object otherwise.
+  """
+
+  if objective == 'hrp':
+    with span('build_hrp_optimizer', assets=len(mu)):
+      return HRPOptimizer(mu, covariance_matrix, weight_bounds,
+                          risk_free_rate, linkage_method)
+  return build_efficient_frontier(mu, covariance_matrix, weight_bounds,
+                                  solver=solver)
+
+
+def run_objective(efficient_frontier_object, objective,
+                  target_volatility=None, target_return=None,
+                  risk_free_rate=0.0):
+  """
+  Accepts the EfficientFrontier object (or the HRPOptimizer of 'hrp', see
+  build_optimizer), the name of an objective, the target volatility or
+  return the efficient_risk and efficient_return objectives need and the
+  risk-free rate of max_sharpe. Returns an OrderedDict of ticker symbols
+  and their weight distribution
+  """
+
+  with span('optimize', objective=objective) as current_span:
+    if objective == 'max_sharpe':
+      asset_weight_allocation = efficient_frontier_object.max_sharpe(
+          risk_free_rate=risk_free_rate)
+    elif objective == 'min_volatility':
+      asset_weight_allocation = efficient_frontier_object.min_volatility()
+    elif objective == 'efficient_risk':
+      if target_volatility is None:
+        raise ValueError("The 'efficient_risk' objective needs a"\
+                         " target_volatility")
+      asset_weight_allocation = efficient_frontier_object.efficient_risk(
+          float(target_volatility))
+    elif objective == 'efficient_return':
+      if target_return is None:
+        raise ValueError("The 'efficient_return' objective needs a"\
+                         " target_return")
+      asset_weight_allocation = efficient_frontier_object.efficient_return(
+          float(target_return))
+    elif objective == 'hrp':
+      asset_weight_allocation = efficient_frontier_object.hrp()
+    else:
+      raise ValueError(f"Unknown objective '{objective}', expected one of"
+                       f" {OBJECTIVES}")
+    current_span.set(**solver_stats(efficient_frontier_object))
+
+  return asset_weight_allocation
+
+
+def compute_discrete_allocation(asset_weight_allocation, daily_adjclose_df,
+                                total_portfolio_value, method='greedy'):
+  """
+  Accepts the OrderedDict of asset_weight_allocation, the price dataframe,
+  the FLOAT total portfolio value and optionally the allocation method
+  ('greedy', 'fast_greedy' or 'lp', see allocation). Calculates the discrete
+  allocation of each ticker at the latest prices. Returns a tuple that
+  includes a dictionary of (KEYS) ticker symbols and (VALUES) of INT, and
+  FLOAT remaining money.
+  """
+
+  from pypfopt.discrete_allocation import get_latest_prices
+
+  with span('discrete_allocation', method=method):
+    latest_prices = get_latest_prices(daily_adjclose_df)
+    return allocate(asset_weight_allocation, latest_prices,
+                    total_portfolio_value, method)
+
+
+def parse_weight_bounds(weight_bounds):
+  """
+  Accepts weight bounds as read from a config file: None, a [min, max] pair
+  for all stocks, or a list of [min, max] pairs, one per stock. Returns
+  None, a tuple or a list of tuples.
+  """
+
+  if weight_bounds is None:
+    return None
+  if len(weight_bounds) == 2 and not isinstance(weight_bounds[0],
+                                                (list, tuple)):
+    return (float(weight_bounds[0]), float(weight_bounds[1]))
+  return [(float(lower), float(upper)) for lower, upper in weight_bounds]
+
+
+def to_date(value):
+  """
+  Accepts a datetime.date or a 'YYYY-MM-DD' string. Returns a datetime.date
+  """
+
+  if isinstance(value, datetime.date):
+    return value
+  return datetime.date.fromisoformat(str(value))
+
+
+def make_price_backend(config):
+  """
+  Accepts the config dictionary. Returns the PriceBackend it asks for:
+  the CSV/Parquet files of 'data_dir' if given, Yahoo! Finance otherwise,
+  behind the on-disk price cache unless 'price_cache' is false.
+  """
+
+  if config.get('data_dir'):
+    return LocalFileBackend(config['data_dir'])
+
+  backend = YahooBackend()
+  price_cache = config.get('price_cache', True)
+  if price_cache:
+    path = DEFAULT_CACHE_PATH if price_cache is True else price_cache
+    backend = CachedBackend(backend, PriceCache(path, ttl=PRICE_CACHE_TTL))
+
+  return backend
+
+
+def get_estimator_cache(config):
+  """
+  Accepts the config dictionary. Returns the process wide EstimatorCache,
+  backed by the 'estimator_cache_dir' directory if the config gives one.
+  """
+
+  directory = config.get('estimator_cache_dir')
+  if not directory:
+    return ESTIMATOR_CACHE
+  if directory not in _estimator_caches_on_disk:
+    _estimator_caches_on_disk[directory] = EstimatorCache(directory=directory)
+  return _estimator_caches_on_disk[directory]
+
+
+def get_result_store(config):
+  """
+  Accepts the config dictionary. Returns the ResultStore at its
+  'result_store' path, opened once per process, or None without one.
+  """
+
+  path = config.get('result_store')
+  if not path:
+    return None
+  if path not in _result_stores:
+    _result_stores[path] = ResultStore(path)
+  return _result_stores[path]
+
+
+def load_config(path):
+  """
+  Accepts the path of a YAML (.yaml/.yml, needs PyYAML) or JSON config
+  file. Returns the config dictionary
+  """
+
+  with open(path) as config_file:
+    if path.endswith(('.yaml', '.yml')):
+      import yaml
+
+      return yaml.safe_load(config_file)
+    return json.load(config_file)
+
+
+def load_prices(config):
+  """
+  Accepts a config dictionary (see optimize_portfolio). Returns the price
+  dataframe of its securities between its start and end dates
+  """
+
+  securities = [security.upper() for security in config['securities']]
+  if config.get('price_store'):
+    return PriceStore(config['price_store']).to_frame(
+        securities, to_date(config['start_date']), to_date(config['end_date']))
+  return load_price_data(to_date(config['start_date']),
+                         to_date(config['end_date']), securities,
+                         backend=make_price_backend(config))
+
+
+def load_market_prices(config):
+  """
+  Accepts a config dictionary. Returns the price Series of its
+  'market_benchmark' ticker between its start and end dates, loaded from
+  the same source as the stocks, or None when it has no benchmark (the
+  CAPM then uses the equally weighted stocks as the market). Every
+  benchmark is only loaded once per process.
+  """
+
+  ticker = config.get('market_benchmark')
+  if not ticker:
+    return None
+
+  key = (ticker.upper(), str(config['start_date']), str(config['end_date']),
+         config.get('data_dir'), config.get('price_store'))
+  if key not in MARKET_PRICES:
+    with span('load_market_prices', ticker=ticker):
+      MARKET_PRICES[key] = load_prices({**config,
+                                        'securities': [ticker]}).iloc[:, 0]
+  return MARKET_PRICES[key]
+
+
+def load_factor_returns(config):
+  """
+  Accepts a config dictionary. Returns the pandas dataframe of the daily
+  factor returns in the CSV file named by its 'factor_returns' key (dates
+  in the first column, one column per factor), or None without one.
+  """
+
+  if not config.get('factor_returns'):
+    return None
+  return pd.read_csv(config['factor_returns'], index_col=0, parse_dates=True)
+
+
+def load_inputs(config, daily_adjclose_df=None):
+  """
+  Accepts a config dictionary (see optimize_portfolio) and, optionally, an
+  already loaded price dataframe. Loads the prices if needed and estimates
+  the expected returns and the covariance matrix. Returns a tuple of
+  (daily_adjclose_df, mu, covariance_matrix)
+  """
+
+  if daily_adjclose_df is None:
+    daily_adjclose_df = load_prices(config)
+
+  estimator_cache = get_estimator_cache(config)
+  with span('price_fingerprint'):
+    fingerprint = price_fingerprint(daily_adjclose_df)
+  log_returns = bool(config.get('log_returns', False))
+  returns_span = int(config.get('returns_span', 500))
+  covariance_span = int(config.get('covariance_span', 180))
+  moments = (shared_moments(daily_adjclose_df, log_returns, returns_span,
+                            covariance_span)
+             if config.get('streaming', True) else None)
+  expected_returns_method = config.get('expected_returns', 'mean')
+  market_prices = (load_market_prices(config)
+                   if expected_returns_method == 'capm' else None)
+  mu = estimate_expected_returns(daily_adjclose_df, expected_returns_method,
+                                 estimator_cache, fingerprint, log_returns,
+                                 moments, market_prices,
+                                 float(config.get('risk_free_rate', 0.0)),
+                                 returns_span)
+  risk_model_method = config.get('risk_model', 'ledoit_wolf')
+  factor_returns = (load_factor_returns(config)
+                    if risk_model_method == 'factor' else None)
+  covariance_matrix = estimate_risk_model(daily_adjclose_df,
+                                          risk_model_method, estimator_cache,
+                                          fingerprint, log_returns, moments,
+                                          covariance_span,
+                                          int(config.get('factors', 20)),
+                                          factor_returns)
+
+  return daily_adjclose_df, mu, covariance_matrix
+
+
+def optimize_portfolio(config, daily_adjclose_df=None):
+  """
+  Accepts a config dictionary and, optionally, an already loaded price
+  dataframe. Runs the whole calculator without asking anything and returns
+  a dictionary of the weights, the discrete allocation, the leftover cash
+  and the expected performance of the optimized portfolio.
+
+  The config keys are:
+    total_portfolio_value: the fund (in USD) to invest
+    securities: the LIST of ticker symbols
+    start_date, end_date: the price history window, as 'YYYY-MM-DD'
+    expected_returns: 'mean', 'ema' or 'capm' (default 'mean')
+    market_benchmark: ticker of the market for the CAPM, loaded like the
+                      securities (default: the equally weighted securities)
+    risk_free_rate: annual risk-free rate of the CAPM, max_sharpe and the
+                    Sharpe ratio (default 0)
+    risk_model: 'sample', 'exponential', 'ledoit_wolf' or 'factor'
+                (default 'ledoit_wolf')
+    factors: the number of statistical factors of the 'factor' risk model
+             (default 20)
+    factor_returns: CSV file of daily factor returns to use as the factors
+                    of the 'factor' risk model instead
+    returns_span, covariance_span: the days the 'ema' expected returns and
+                                   the 'exponential' risk model give more
+                                   weight to (default 500 and 180)
+    weight_bounds: [min, max] for all stocks, or a list of [min, max] pairs
+    objective: 'max_sharpe', 'min_volatility', 'efficient_risk',
+               'efficient_return' or 'hrp' (Hierarchical Risk Parity, which
+               needs no solver, see hrp) (default 'max_sharpe')
+    linkage: the clustering of 'hrp': 'single', 'complete', 'average' or
+             'ward' (default 'single')
+    target_volatility, target_return: for the last two objectives
+    allocation: 'greedy', 'fast_greedy' or 'lp' (default 'greedy')
+    log_returns: estimate from log returns instead of simple returns
+                 (default false)
+    streaming: estimate from one chunked pass over the prices shared by
+               the expected returns and the risk model (default true)
+    data_dir: read the prices from local CSV/Parquet files instead
+    price_store: read the prices from this memory-mapped price store
+                 (see price_store.write_price_store) instead
+    price_cache: path of the on-disk price cache, or false to disable it
+    estimator_cache_dir: also keep the estimated expected returns and
+                         covariance matrices in this directory
+    result_store: path of a SQLite result store (see result_store) where
+                  every run is saved, and from which the result of a config
+                  already optimized is returned without solving it again
+    result_max_age: only reuse stored results younger than this many
+                    seconds (default: any age)
+  """
+
+  result_store = get_result_store(config)
+  if result_store is not None:
+    with span('result_store_lookup'):
+      result = result_store.lookup(config, config.get('result_max_age'))
+    if result is not None:
+      return result
+
+  first_record = instrumentation.record_count()
+  start = time.perf_counter()
+  with span('optimize_portfolio'):
+    result = _optimize_portfolio(config, daily_adjclose_df)
+
+  if result_store is not None:
+    timings = {'total_seconds': time.perf_counter() - start}
+    if instrumentation.is_enabled():
+      # The stages of this run, added up by name
+      thread = threading.get_ident()
+      for record in instrumentation.get_records(since=first_record):
+        name = record['name']
+        if record['thread'] == thread and name != 'optimize_portfolio':
+          timings[name] = timings.get(name, 0.0) + record['wall_seconds']
+    with span('result_store_save'):
+      result_store.save(config, result, timings)
+
+  return result
+
+
+def _optimize_portfolio(config, daily_adjclose_df):
+  daily_adjclose_df, mu, covariance_matrix = load_inputs(config,
+                                                         daily_adjclose_df)
+  return _optimize_inputs(config, daily_adjclose_df, mu, covariance_matrix)
+
+
+def _optimize_inputs(config, daily_adjclose_df, mu, covariance_matrix):
+  total_portfolio_value = float(config['total_portfolio_value'])
+  weight_bounds = parse_weight_bounds(config.get('weight_bounds'))
+  risk_free_rate = float(config.get('risk_free_rate', 0.0))
+  objective = config.get('objective', 'max_sharpe')
+  efficient_frontier_object = build_optimizer(mu, covariance_matrix,
+                                              weight_bounds, objective,
+                                              risk_free_rate,
+                                              config.get('linkage', 'single'))
+  asset_weight_allocation = run_objective(
+      efficient_frontier_object, objective,
+      config.get('target_volatility'), config.get('target_return'),
+      risk_free_rate)
+  performance = efficient_frontier_object.portfolio_performance(
+      verbose=False, risk_free_rate=risk_free_rate)
+
+  discrete_allocation, leftover = compute_discrete_allocation(
+      asset_weight_allocation, daily_adjclose_df, total_portfolio_value,
+      config.get('allocation', 'greedy'))
+
+  return {
+      'weights': {ticker: float(weight)
+                  for ticker, weight in asset_weight_allocation.items()},
+      'discrete_allocation': {ticker: int(number_of_stock)
+                              for ticker, number_of_stock
+                              in discrete_allocation.items()},
+      'leftover': float(leftover),
+      'total_portfolio_value': total_portfolio_value,
+      'performance': {'expected_annual_return': float(performance[0]),
+                      'annual_volatility': float(performance[1]),
+                      'sharpe_ratio': float(performance[2])},
+  }
+
+
+def optimize_spans(config, spans, daily_adjclose_df=None):
+  """
+  Accepts a config dictionary (see optimize_portfolio), a LIST of spans
+  (in days) and, optionally, an already loaded price dataframe. Runs the
+  calculator once per span with the EMA expected returns and the
+  exponential covariance of that span, all estimated from a single pass
+  over the prices (or with PyPortfolioOpt, one span at a time, when some
+  prices are missing). Returns a dictionary of (KEYS) spans and (VALUES) the
+  result dictionaries of optimize_portfolio.
+  """
+
+  spans = [int(days) for days in spans]
+  with span('optimize_spans', spans=len(spans)):
+    if daily_adjclose_df is None:
+      daily_adjclose_df = load_prices(config)
+
+    log_returns = bool(config.get('log_returns', False))
+    with span('multi_span_moments', days=len(daily_adjclose_df),
+              assets=daily_adjclose_df.shape[1], spans=len(spans)):
+      try:
+        estimator = MultiSpanEstimator.from_prices(daily_adjclose_df, spans,
+                                                   log_returns=log_returns)
+      except ValueError:
+        estimator = None
+
+    from pypfopt import risk_models
+
+    results = {}
+    for days in spans:
+      if estimator is None:
+        mu = estimate_expected_returns(daily_adjclose_df, 'ema',
+                                       log_returns=log_returns,
+                                       returns_span=days)
+        covariance_matrix = estimate_risk_model(daily_adjclose_df,
+                                                'exponential',
+                                                log_returns=log_returns,
+                                                covariance_span=days)
+      else:
+        mu = estimator.ema_historical_return(days)
+        with span('fix_nonpositive_semidefinite'):
+          covariance_matrix = risk_models.fix_nonpositive_semidefinite(
+              estimator.exp_cov(days))
+      span_config = dict(config, expected_returns='ema',
+                         risk_model='exponential', returns_span=days,
+                         covariance_span=days)
+      with span('optimize_portfolio', returns_span=days):
+        results[days] = _optimize_inputs(span_config, daily_adjclose_df, mu,
+                                         covariance_matrix)
+
+  return results
@@ -0,0 +1,205 @@
+"""On-disk price cache.
+
+Stores the daily adjusted closing prices of every ticker that was ever
+downloaded in a local SQLite database, so that later runs only need to
+download the dates that are not on disk yet.
+"""
+
+import datetime as datetime
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+from portfolio_optimizer.price_loader import PriceBackend
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser('~'),
+                                  '.portfolio_optimizer', 'prices.sqlite')
+
+ONE_DAY = datetime.timedelta(days=1)
+
+
+def to_date(value):
+  """
+  Accepts a date, datetime, pandas Timestamp or 'YYYY-MM-DD' string.
+  Returns a datetime.date
+  """
+
+  return pd.Timestamp(value).date()
+
+
+class PriceCache:
+  """
+  SQLite store of per-ticker daily bars. For every ticker it remembers the
+  contiguous date range that has been downloaded (its coverage), when it
+  was downloaded and when it was last read.
+
+  Tickers downloaded more than ttl seconds ago are dropped and downloaded
+  again in full, which also picks up dividend/split re-adjustments of the
+  adjusted closing prices. When more than max_tickers tickers are stored,
+  the least recently read ones are dropped.
+  """
+
+  def __init__(self, path=DEFAULT_CACHE_PATH, ttl=None, max_tickers=None):
+    self.path = path
+    self.ttl = ttl
+    self.max_tickers = max_tickers
+    self._lock = threading.Lock()
+
+    directory = os.path.dirname(path)
+    if directory:
+      os.makedirs(directory, exist_ok=True)
+    self._connection = sqlite3.connect(path, check_same_thread=False)
+    with self._connection:
+      self._connection.execute(
+          'CREATE TABLE IF NOT EXISTS prices ('
+          ' ticker TEXT NOT NULL, date TEXT NOT NULL, adj_close REAL,'
+          ' PRIMARY KEY (ticker, date))')
+      self._connection.execute(
+          'CREATE TABLE IF NOT EXISTS coverage ('
+          ' ticker TEXT PRIMARY KEY, start TEXT NOT NULL, end TEXT NOT NULL,'
+          ' fetched_at REAL NOT NULL, last_access REAL NOT NULL)')
+
+  def close(self):
+    self._connection.close()
+
+  def coverage(self, ticker):
+    """
+    Accepts a ticker. Returns a tuple of the (start, end) datetime.date
+    range stored for it, or None if nothing (fresh) is stored.
+    """
+
+    with self._lock:
+      row = self._connection.execute(
+          'SELECT start, end, fetched_at FROM coverage WHERE ticker = ?',
+          (ticker,)).fetchone()
+      if row is None:
+        return None
+      start, end, fetched_at = row
+      if self.ttl is not None and time.time() - fetched_at > self.ttl:
+        self._evict(ticker)
+        return None
+
+    return to_date(start), to_date(end)
+
+  def read(self, ticker, start_date, end_date):
+    """
+    Accepts a ticker and the start and end dates. Returns a pandas Series
+    of the stored adjusted closing prices within that window.
+    """
+
+    with self._lock:
+      rows = self._connection.execute(
+          'SELECT date, adj_close FROM prices'
+          ' WHERE ticker = ? AND date >= ? AND date <= ? ORDER BY date',
+          (ticker, to_date(start_date).isoformat(),
+           to_date(end_date).isoformat())).fetchall()
+      with self._connection:
+        self._connection.execute(
+            'UPDATE coverage SET last_access = ? WHERE ticker = ?',
+            (time.time(), ticker))
+
+    prices = pd.Series([adj_close for _, adj_close in rows],
+                       index=pd.DatetimeIndex([date for date, _ in rows],
+                                              name='Date'),
+                       name=ticker, dtype='float64')
+
+    return prices
+
+  def write(self, ticker, prices, start_date, end_date):
+    """
+    Accepts a ticker, a pandas Series of its adjusted closing prices and the
+    start and end dates that were downloaded. Stores the prices and extends
+    the ticker's coverage to include the downloaded range.
+    """
+
+    start_date, end_date = to_date(start_date), to_date(end_date)
+    rows = [(ticker, to_date(date).isoformat(), float(adj_close))
+            for date, adj_close in prices.dropna().items()]
+
+    with self._lock:
+      row = self._connection.execute(
+          'SELECT start, end FROM coverage WHERE ticker = ?',
+          (ticker,)).fetchone()
+      if row is not None:
+        start_date = min(start_date, to_date(row[0]))
+        end_date = max(end_date, to_date(row[1]))
+      now = time.time()
+      with self._connection:
+        self._connection.executemany(
+            'INSERT OR REPLACE INTO prices VALUES (?, ?, ?)', rows)
+        if row is None:
+          self._connection.execute(
+              'INSERT INTO coverage VALUES (?, ?, ?, ?, ?)',
+              (ticker, start_date.isoformat(), end_date.isoformat(), now, now))
+        else:
+          self._connection.execute(
+              'UPDATE coverage SET start = ?, end = ?, last_access = ?'
+              ' WHERE ticker = ?',
+              (start_date.isoformat(), end_date.isoformat(), now, ticker))
+      self._enforce_size()
+
+  def evict(self, ticker):
+    with self._lock:
+      self._evict(ticker)
+
+  def _evict(self, ticker):
+    with self._connection:
+      self._connection.execute('DELETE FROM prices WHERE ticker = ?',
+                               (ticker,))
+      self._connection.execute('DELETE FROM coverage WHERE ticker = ?',
+                               (ticker,))
+
+  def _enforce_size(self):
+    if self.max_tickers is None:
+      return
+    stale_tickers = self._connection.execute(
+        'SELECT ticker FROM coverage ORDER BY last_access DESC'
+        ' LIMIT -1 OFFSET ?', (self.max_tickers,)).fetchall()
+    for (ticker,) in stale_tickers:
+      self._evict(ticker)
+
+
+class CachedBackend(PriceBackend):
+  """
+  Wraps another PriceBackend with a PriceCache. Requested windows are served
+  from disk and only the dates before or after what is already stored are
+  downloaded from the wrapped backend.
+  """
+
+  def __init__(self, backend, cache):
+    self.backend = backend
+    self.cache = cache
+    self.transient_errors = backend.transient_errors
+
+  def fetch(self, security, start_date, end_date):
+    start_date, end_date = to_date(start_date), to_date(end_date)
+    # Today's bar is not final yet, so never mark it as covered
+    last_final_date = min(end_date, datetime.date.today() - ONE_DAY)
+
+    coverage = self.cache.coverage(security)
+    if coverage is None:
+      missing_ranges = [(start_date, end_date)]
+    else:
+      covered_start, covered_end = coverage
+      missing_ranges = []
+      if start_date < covered_start:
+        missing_ranges.append((start_date, covered_start - ONE_DAY))
+      if end_date > covered_end:
+        missing_ranges.append((covered_end + ONE_DAY, end_date))
+
+    for missing_start, missing_end in missing_ranges:
+      prices = self.backend.fetch(security, missing_start, missing_end)
+      if missing_start <= last_final_date:
+        self.cache.write(security, prices, missing_start,
+                         min(missing_end, last_final_date))
+      if missing_end > last_final_date:
+        # Serve the unfinished bars of today without caching them
+        recent_prices = prices.loc[pd.Timestamp(last_final_date + ONE_DAY):]
+        return pd.concat([self.cache.read(security, start_date,
+                                          last_final_date),
+                          recent_prices])
+
+    return self.cache.read(security, start_date, end_date)
@@ -0,0 +1,137 @@
+"""Price loader.
+
+Fetches the daily adjusted closing prices of many securities concurrently
+from a pluggable data-source backend and assembles them into one aligned
+pandas dataframe.
+"""
+
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from portfolio_optimizer.instrumentation import span
+
+
+class PriceBackend:
+  """
+  Base class for the data sources the price loader can fetch from.
+  Subclasses implement fetch(), which returns a pandas Series of the daily
+  adjusted closing prices of ONE security, indexed by date.
+  """
+
+  # Errors worth retrying (network hiccups, rate limiting...). The
+  # pandas_datareader RemoteDataError is a subclass of OSError.
+  transient_errors = (OSError,)
+
+  def fetch(self, security, start_date, end_date):
+    raise NotImplementedError
+
+
+class YahooBackend(PriceBackend):
+  """
+  Fetches the prices from Yahoo! Finance through pandas_datareader, the
+  same way the calculator always did.
+  """
+
+  def fetch(self, security, start_date, end_date):
+    import pandas_datareader.data as web
+
+    return web.DataReader(security, data_source='yahoo', start=start_date,
+                          end=end_date)['Adj Close']
+
+
+class LocalFileBackend(PriceBackend):
+  """
+  Reads the prices from a directory holding one '<TICKER>.csv' or
+  '<TICKER>.parquet' file per security, with a 'Date' column and an
+  'Adj Close' column. Meant as a local stand-in for the network in tests,
+  CI and benchmarks. The optional latency (in seconds) is slept on every
+  fetch to mimic a remote round trip.
+  """
+
+  def __init__(self, directory, latency=0.0):
+    self.directory = directory
+    self.latency = latency
+
+  def fetch(self, security, start_date, end_date):
+    if self.latency:
+      time.sleep(self.latency)
+
+    parquet_path = os.path.join(self.directory, f'{security}.parquet')
+    if os.path.exists(parquet_path):
+      price_df = pd.read_parquet(parquet_path)
+    else:
+      csv_path = os.path.join(self.directory, f'{security}.csv')
+      if not os.path.exists(csv_path):
+        raise KeyError(f'No price file for {security} in {self.directory}')
+      price_df = pd.read_csv(csv_path)
+
+    if 'Date' in price_df.columns:
+      price_df = price_df.set_index('Date')
+    price_df.index = pd.to_datetime(price_df.index)
+    prices = price_df['Adj Close'].sort_index()
+
+    return prices.loc[pd.Timestamp(start_date):pd.Timestamp(end_date)]
+
+
+def fetch_with_retries(backend, security, start_date, end_date, retries=3,
+                       retry_delay=0.5):
+  """
+  Accepts a PriceBackend, a security and the start and end dates. Fetches
+  the prices of the security, retrying up to 'retries' times with an
+  exponential backoff when the backend raises one of its transient errors.
+  Returns a pandas Series named after the security.
+  """
+
+  attempt = 0
+  with span('fetch_prices', security=security) as current_span:
+    while True:
+      try:
+        prices = backend.fetch(security, start_date, end_date)
+        break
+      except backend.transient_errors:
+        attempt += 1
+        if attempt > retries:
+          raise
+        time.sleep(retry_delay * 2 ** (attempt - 1))
+    current_span.set(retries=attempt)
+
+  prices = pd.Series(prices, copy=False)
+  prices.name = security
+
+  return prices
+
+
+def load_price_data(start_date, end_date, securities, backend=None,
+                    max_workers=8, retries=3, retry_delay=0.5):
+  """
+  Accepts start_date, end_date, a LIST of securities and optionally a
+  PriceBackend (Yahoo! Finance by default). Fetches the securities
+  concurrently with at most max_workers requests in flight, then returns a
+  pandas dataframe of the daily adjusted closing prices, one column per
+  security in the order they were given.
+  """
+
+  if backend is None:
+    backend = YahooBackend()
+
+  securities = list(securities)
+  if not securities:
+    return pd.DataFrame()
+
+  max_workers = max(1, min(max_workers, len(securities)))
+  with span('load_prices', securities=len(securities),
+            max_workers=max_workers):
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+      futures = [executor.submit(fetch_with_retries, backend, security,
+                                 start_date, end_date, retries, retry_delay)
+                 for security in securities]
+      price_series = [future.result() for future in futures]
+
+    daily_adjclose_df = pd.concat(price_series, axis=1)
+  daily_adjclose_df.columns = securities
+  daily_adjclose_df.index.name = 'Date'
+
+  return daily_adjclose_df
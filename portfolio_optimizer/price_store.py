@@ -0,0 +1,110 @@
+"""Columnar price store.
+
+Keeps a whole price panel on disk as one contiguous NumPy array (rows are
+days, columns are tickers) in .npy format, with the dates and tickers
+stored once next to it. Opening a store memory-maps the array, so it is
+near-instant whatever the size of the panel and the pages are only read
+from disk when they are used.
+
+A store is a directory holding:
+  values.npy    the prices, float64 or float32
+  dates.npy     the dates of the rows, as datetime64[D]
+  tickers.json  the tickers of the columns
+"""
+
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+def write_price_store(daily_adjclose_df, directory, dtype='float64',
+                      chunk_rows=4096):
+  """
+  Accepts a price dataframe, the directory of the store and the dtype of
+  the stored prices ('float64' or 'float32'). Writes the store, chunk_rows
+  days at a time so that the prices are never held twice in memory.
+  """
+
+  os.makedirs(directory, exist_ok=True)
+  n_days, n_tickers = daily_adjclose_df.shape
+
+  values = np.lib.format.open_memmap(os.path.join(directory, 'values.npy'),
+                                     mode='w+', dtype=dtype,
+                                     shape=(n_days, n_tickers))
+  for start in range(0, n_days, chunk_rows):
+    values[start:start + chunk_rows] = (daily_adjclose_df
+                                        .iloc[start:start + chunk_rows]
+                                        .to_numpy(dtype=dtype))
+  values.flush()
+  del values
+
+  np.save(os.path.join(directory, 'dates.npy'),
+          daily_adjclose_df.index.to_numpy(dtype='datetime64[D]'))
+  with open(os.path.join(directory, 'tickers.json'), 'w') as tickers_file:
+    json.dump([str(ticker) for ticker in daily_adjclose_df.columns],
+              tickers_file)
+
+
+class PriceStore:
+  """
+  A price store opened read-only. values is the memory-mapped (days x
+  tickers) array, dates a pandas DatetimeIndex and tickers a LIST.
+  """
+
+  def __init__(self, directory):
+    self.directory = directory
+    self.values = np.load(os.path.join(directory, 'values.npy'),
+                          mmap_mode='r')
+    self.dates = pd.DatetimeIndex(np.load(os.path.join(directory,
+                                                       'dates.npy')),
+                                  name='Date')
+    with open(os.path.join(directory, 'tickers.json')) as tickers_file:
+      self.tickers = json.load(tickers_file)
+    self._columns = {ticker: column
+                     for column, ticker in enumerate(self.tickers)}
+
+  def rows(self, start_date=None, end_date=None):
+    """
+    Accepts optional start and end dates. Returns the slice of the rows
+    between them (both included).
+    """
+
+    start = (0 if start_date is None
+             else self.dates.searchsorted(pd.Timestamp(start_date), 'left'))
+    end = (len(self.dates) if end_date is None
+           else self.dates.searchsorted(pd.Timestamp(end_date), 'right'))
+    return slice(start, end)
+
+  def columns(self, securities=None):
+    """
+    Accepts an optional LIST of securities. Returns a slice when they are
+    all the tickers in store order (so indexing stays a view), otherwise an
+    array of their column numbers.
+    """
+
+    if securities is None or list(securities) == self.tickers:
+      return slice(None)
+    missing = [security for security in securities
+               if security not in self._columns]
+    if missing:
+      raise KeyError(f'Not in the price store: {missing}')
+    return np.array([self._columns[security] for security in securities])
+
+  def to_frame(self, securities=None, start_date=None, end_date=None):
+    """
+    Accepts an optional LIST of securities and start and end dates. Returns
+    a pandas dataframe of their prices. When all the tickers are asked for,
+    the dataframe is a view of the memory-mapped array and nothing is
+    copied; a subset of the tickers is copied.
+    """
+
+    rows = self.rows(start_date, end_date)
+    columns = self.columns(securities)
+    values = self.values[rows, columns]
+    tickers = self.tickers if securities is None else list(securities)
+
+    return pd.DataFrame(values, index=self.dates[rows], columns=tickers,
+                        copy=False)
+
@@ -0,0 +1,332 @@
+"""Resampled efficient frontier.
+
+The weights of max_sharpe (and, less so, of the other objectives) swing
+with the estimation noise in the expected returns and the covariance. The
+resampled portfolio averages them over many bootstrap samples of the price
+history instead: every sample draws the days of returns with replacement,
+re-estimates mu and the covariance from them with the config's methods and
+solves the config's objective.
+
+The samples run on a process pool sharing the price dataframe through
+shared memory (see batch). Each worker compiles its optimizer session once,
+with mu and the covariance as cvxpy parameters, and only updates them for
+every sample. Sample number i always draws from the i-th child of the
+seed's SeedSequence, so the result does not depend on the number of
+workers.
+"""
+
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from portfolio_optimizer import batch
+from portfolio_optimizer.batch import share_prices, attach_shared_prices
+from portfolio_optimizer.factor_model import FactorRiskModel
+from portfolio_optimizer.hrp import HRPOptimizer
+from portfolio_optimizer.instrumentation import span
+from portfolio_optimizer.pipeline import (estimate_expected_returns,
+                                          estimate_risk_model,
+                                          shared_moments, load_prices,
+                                          load_inputs, load_market_prices,
+                                          load_factor_returns,
+                                          parse_weight_bounds, run_objective,
+                                          compute_discrete_allocation)
+
+DEFAULT_RESAMPLES = 500
+
+# OSQP needs thousands of iterations on the max_sharpe problem written with
+# a covariance root, the interior point solver a few dozen
+RESAMPLE_SOLVER = 'CLARABEL'
+
+# Set in every worker process by _attach_resampling()
+_market_prices = None
+_factor_returns = None
+# Optimizer sessions compiled by this process, for the most recent tickers
+# and solvers
+WORKER_SESSIONS = 4
+_worker_sessions = OrderedDict()
+
+
+def bootstrap_prices(daily_adjclose_df, rng, market_prices=None,
+                     factor_returns=None):
+  """
+  Accepts the price dataframe, a numpy Generator and optionally the market
+  prices Series and the factor returns dataframe. Returns a tuple of the
+  price dataframe rebuilt from days of returns drawn with replacement, and
+  the market prices and factor returns of the same days (or None). Only
+  the days on which every stock (and the market and factors) has a return
+  are drawn. The dates are kept, each column starting at 1.
+  """
+
+  prices = daily_adjclose_df.to_numpy(dtype='float64')
+  with np.errstate(divide='ignore', invalid='ignore'):
+    returns = prices[1:] / prices[:-1] - 1
+  dates = daily_adjclose_df.index[1:]
+  complete = ~np.isnan(returns).any(axis=1)
+
+  if market_prices is not None:
+    market = market_prices.reindex(daily_adjclose_df.index).to_numpy(
+        dtype='float64')
+    with np.errstate(divide='ignore', invalid='ignore'):
+      market_returns = market[1:] / market[:-1] - 1
+    complete &= ~np.isnan(market_returns)
+  if factor_returns is not None:
+    factors = pd.DataFrame(factor_returns).sort_index()
+    factors.index = pd.to_datetime(factors.index)
+    factors = factors.reindex(dates)
+    complete &= factors.notna().all(axis=1).to_numpy()
+
+  days = np.flatnonzero(complete)
+  if len(days) < 2:
+    raise ValueError('Need at least two days on which every stock has a'\
+                     ' return to bootstrap the prices')
+  drawn = days[rng.integers(0, len(days), len(days))]
+  index = daily_adjclose_df.index[:len(days) + 1]
+
+  def rebuild(sampled_returns):
+    starts = np.ones((1,) + sampled_returns.shape[1:])
+    return np.concatenate([starts, np.cumprod(1 + sampled_returns, axis=0)])
+
+  sample_df = pd.DataFrame(rebuild(returns[drawn]), index=index,
+                           columns=daily_adjclose_df.columns)
+  sample_market = None
+  if market_prices is not None:
+    sample_market = pd.Series(rebuild(market_returns[drawn]), index=index,
+                              name=market_prices.name)
+  sample_factors = None
+  if factor_returns is not None:
+    sample_factors = pd.DataFrame(factors.to_numpy()[drawn], index=index[1:],
+                                  columns=factors.columns)
+
+  return sample_df, sample_market, sample_factors
+
+
+def estimate_inputs(config, daily_adjclose_df, market_prices=None,
+                    factor_returns=None):
+  """
+  Accepts a config and a price dataframe, with the market prices and factor
+  returns its methods need. Returns a tuple of mu and the covariance matrix
+  estimated with the config's methods, without any estimator cache.
+  """
+
+  log_returns = bool(config.get('log_returns', False))
+  returns_span = int(config.get('returns_span', 500))
+  covariance_span = int(config.get('covariance_span', 180))
+  moments = shared_moments(daily_adjclose_df, log_returns, returns_span,
+                           covariance_span)
+  mu = estimate_expected_returns(
+      daily_adjclose_df, config.get('expected_returns', 'mean'),
+      log_returns=log_returns, moments=moments, market_prices=market_prices,
+      risk_free_rate=float(config.get('risk_free_rate', 0.0)),
+      returns_span=returns_span)
+  covariance_matrix = estimate_risk_model(
+      daily_adjclose_df, config.get('risk_model', 'ledoit_wolf'),
+      log_returns=log_returns, moments=moments,
+      covariance_span=covariance_span,
+      n_factors=int(config.get('factors', 20)), factor_returns=factor_returns)
+
+  return mu, covariance_matrix
+
+
+def _attach_resampling(description, market_prices, factor_returns):
+  global _market_prices, _factor_returns
+
+  attach_shared_prices(description)
+  _market_prices, _factor_returns = market_prices, factor_returns
+
+
+def _worker_session(mu, covariance_matrix, weight_bounds, risk_free_rate,
+                    solver):
+  # The session imports cvxpy, which the HRP samples do not need
+  from portfolio_optimizer.session import OptimizerSession
+
+  key = (tuple(mu.index), solver)
+  if key not in _worker_sessions:
+    _worker_sessions[key] = OptimizerSession(mu, covariance_matrix,
+                                             weight_bounds,
+                                             risk_free_rate=risk_free_rate,
+                                             solver=solver,
+                                             parametric_inputs=True)
+    while len(_worker_sessions) > WORKER_SESSIONS:
+      _worker_sessions.popitem(last=False)
+    return _worker_sessions[key]
+
+  _worker_sessions.move_to_end(key)
+  optimizer_session = _worker_sessions[key]
+  optimizer_session.set_inputs(mu, covariance_matrix)
+  optimizer_session.set_weight_bounds(weight_bounds)
+  optimizer_session.set_risk_free_rate(risk_free_rate)
+  return optimizer_session
+
+
+def solve_samples(config, seed_sequences, solver=RESAMPLE_SOLVER,
+                  daily_adjclose_df=None, market_prices=None,
+                  factor_returns=None):
+  """
+  Accepts a config, a LIST of (sample number, SeedSequence) pairs and the
+  cvxpy solver, plus the price dataframe, market prices and factor returns
+  (those shared with the worker by default). Bootstraps and solves every
+  sample. Returns a tuple of the LIST of sample numbers, the (samples x
+  stocks) array of their weights, NaN for the samples that failed, and the
+  LIST of their errors.
+  """
+
+  if daily_adjclose_df is None:
+    daily_adjclose_df = batch._shared_prices
+    market_prices, factor_returns = _market_prices, _factor_returns
+
+  from pypfopt import exceptions
+
+  objective = config.get('objective', 'max_sharpe')
+  weight_bounds = parse_weight_bounds(config.get('weight_bounds'))
+  risk_free_rate = float(config.get('risk_free_rate', 0.0))
+  numbers = [number for number, _ in seed_sequences]
+  weights = np.full((len(seed_sequences), daily_adjclose_df.shape[1]), np.nan)
+  errors = []
+
+  for row, (number, seed_sequence) in enumerate(seed_sequences):
+    rng = np.random.default_rng(seed_sequence)
+    try:
+      with span('resample', sample=number):
+        sample_df, sample_market, sample_factors = bootstrap_prices(
+            daily_adjclose_df, rng, market_prices, factor_returns)
+        mu, covariance_matrix = estimate_inputs(config, sample_df,
+                                                sample_market, sample_factors)
+        if objective == 'hrp':
+          optimizer = HRPOptimizer(mu, covariance_matrix, weight_bounds,
+                                   risk_free_rate,
+                                   config.get('linkage', 'single'))
+        else:
+          optimizer = _worker_session(mu, covariance_matrix, weight_bounds,
+                                      risk_free_rate, solver)
+        asset_weight_allocation = run_objective(
+            optimizer, objective, config.get('target_volatility'),
+            config.get('target_return'), risk_free_rate)
+    except (ValueError, exceptions.OptimizationError) as error:
+      # Targets can be out of reach for some samples
+      errors.append(f'{number}: {type(error).__name__}: {error}')
+      continue
+    weights[row] = list(asset_weight_allocation.values())
+
+  return numbers, weights, errors
+
+
+def resampled_weights(config, daily_adjclose_df=None,
+                      resamples=DEFAULT_RESAMPLES, seed=0, max_workers=None,
+                      solver=RESAMPLE_SOLVER):
+  """
+  Accepts a config, optionally its already loaded price dataframe, the
+  number of bootstrap samples, the INT seed, the number of worker
+  processes (one per CPU by default, 1 to run in this process) and the
+  cvxpy solver. Returns a dictionary of the pandas Series of the 'weights'
+  averaged over the samples that solved and of their standard deviation
+  'weight_std', the (samples x stocks) array of the 'sample_weights' (NaN
+  for the failed samples) and the LIST of 'errors'.
+  """
+
+  if daily_adjclose_df is None:
+    daily_adjclose_df = load_prices(config)
+  market_prices = (load_market_prices(config)
+                   if config.get('expected_returns') == 'capm' else None)
+  factor_returns = (load_factor_returns(config)
+                    if config.get('risk_model') == 'factor' else None)
+
+  children = np.random.SeedSequence(seed).spawn(resamples)
+  seed_sequences = list(enumerate(children))
+  max_workers = max_workers or os.cpu_count()
+  sample_weights = np.full((resamples, daily_adjclose_df.shape[1]), np.nan)
+  errors = []
+
+  with span('resampled_weights', resamples=resamples,
+            assets=daily_adjclose_df.shape[1], workers=max_workers):
+    if max_workers == 1:
+      chunks = [solve_samples(config, seed_sequences, solver,
+                              daily_adjclose_df, market_prices,
+                              factor_returns)]
+    else:
+      # A few chunks per worker balance the load without paying for the
+      # transfer of every sample
+      chunk_size = max(1, -(-resamples // (4 * max_workers)))
+      block, description = share_prices(daily_adjclose_df)
+      try:
+        with ProcessPoolExecutor(max_workers=max_workers,
+                                 initializer=_attach_resampling,
+                                 initargs=(description, market_prices,
+                                           factor_returns)) as executor:
+          futures = [executor.submit(solve_samples, config,
+                                     seed_sequences[start:start + chunk_size],
+                                     solver)
+                     for start in range(0, resamples, chunk_size)]
+          chunks = [future.result() for future in futures]
+      finally:
+        block.close()
+        block.unlink()
+
+    for numbers, weights, chunk_errors in chunks:
+      sample_weights[numbers] = weights
+      errors.extend(chunk_errors)
+
+  solved = ~np.isnan(sample_weights).any(axis=1)
+  if not solved.any():
+    raise ValueError(f'None of the {resamples} samples could be solved:'\
+                     f' {errors[:3]}')
+  mean_weights = sample_weights[solved].mean(axis=0)
+
+  return {'weights': pd.Series(mean_weights / mean_weights.sum(),
+                               index=daily_adjclose_df.columns),
+          'weight_std': pd.Series(sample_weights[solved].std(axis=0),
+                                  index=daily_adjclose_df.columns),
+          'sample_weights': sample_weights,
+          'errors': errors}
+
+
+def optimize_resampled(config, daily_adjclose_df=None,
+                       resamples=DEFAULT_RESAMPLES, seed=0, max_workers=None,
+                       solver=RESAMPLE_SOLVER):
+  """
+  Accepts the same arguments as resampled_weights. Returns the result
+  dictionary of optimize_portfolio for the resampled portfolio, its
+  performance measured with the estimates from the full price history,
+  plus the 'weight_std' of every ticker over the samples and the numbers
+  of 'resamples' and 'failed_resamples'.
+  """
+
+  daily_adjclose_df, mu, covariance_matrix = load_inputs(config,
+                                                         daily_adjclose_df)
+  resampled = resampled_weights(config, daily_adjclose_df, resamples, seed,
+                                max_workers, solver)
+  weights = resampled['weights']
+
+  expected_return = float(weights.to_numpy() @ np.asarray(mu))
+  if isinstance(covariance_matrix, FactorRiskModel):
+    variance = covariance_matrix.portfolio_variances(weights.to_numpy())
+  else:
+    variance = weights.to_numpy() @ np.asarray(covariance_matrix) \
+               @ weights.to_numpy()
+  volatility = float(np.sqrt(variance))
+  risk_free_rate = float(config.get('risk_free_rate', 0.0))
+
+  total_portfolio_value = float(config['total_portfolio_value'])
+  discrete_allocation, leftover = compute_discrete_allocation(
+      weights.to_dict(), daily_adjclose_df, total_portfolio_value,
+      config.get('allocation', 'greedy'))
+
+  return {
+      'weights': {ticker: float(weight) for ticker, weight in weights.items()},
+      'discrete_allocation': {ticker: int(number_of_stock)
+                              for ticker, number_of_stock
+                              in discrete_allocation.items()},
+      'leftover': float(leftover),
+      'total_portfolio_value': total_portfolio_value,
+      'performance': {'expected_annual_return': expected_return,
+                      'annual_volatility': volatility,
+                      'sharpe_ratio': (expected_return - risk_free_rate)
+                                      / volatility},
+      'weight_std': {ticker: float(std)
+                     for ticker, std in resampled['weight_std'].items()},
+      'resamples': resamples,
+      'failed_resamples': len(resampled['errors']),
+  }
@@ -0,0 +1,218 @@
+"""Optimization result store.
+
+Keeps every optimization run (its config, weights, discrete allocation,
+leftover cash, performance and timings) in a local SQLite database,
+indexed on the hash of the config and on the date of the run. Asking again
+for a config that was already optimized returns the stored result instead
+of solving it again; the latest results are also kept in memory so that
+repeated lookups do not even read the database.
+"""
+
+import datetime as datetime
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+DEFAULT_RESULT_STORE_PATH = os.path.join(os.path.expanduser('~'),
+                                         '.portfolio_optimizer',
+                                         'results.sqlite')
+
+# Config keys that change where things are stored or how fast they are
+# computed, but not the result
+RESULT_NEUTRAL_KEYS = ('price_cache', 'estimator_cache_dir', 'result_store',
+                       'result_max_age', 'streaming', 'grid')
+
+HISTORY_COLUMNS = ('id', 'config_hash', 'run_date', 'created_at',
+                   'securities', 'start_date', 'end_date', 'expected_returns',
+                   'risk_model', 'objective', 'weight_bounds',
+                   'total_portfolio_value', 'expected_annual_return',
+                   'annual_volatility', 'sharpe_ratio', 'leftover',
+                   'total_seconds')
+
+
+def config_hash(config):
+  """
+  Accepts a config dictionary. Returns a STRING that is the same for every
+  config asking for the same optimization.
+  """
+
+  relevant = {key: value for key, value in config.items()
+              if key not in RESULT_NEUTRAL_KEYS}
+  canonical = json.dumps(relevant, sort_keys=True, default=str,
+                         separators=(',', ':'))
+  return hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+
+
+def _json_or_none(value):
+  return None if value is None else json.dumps(value, default=str)
+
+
+def _date_or_none(value):
+  return None if value is None else pd.Timestamp(value).date().isoformat()
+
+
+class ResultStore:
+  """
+  SQLite store of optimization results. Stored results older than max_age
+  seconds are ignored by lookup() (but kept for history()), and at most
+  max_entries results are kept in memory.
+  """
+
+  def __init__(self, path=DEFAULT_RESULT_STORE_PATH, max_age=None,
+               max_entries=256):
+    self.path = path
+    self.max_age = max_age
+    self.max_entries = max_entries
+    self._entries = OrderedDict()
+    self._lock = threading.Lock()
+
+    directory = os.path.dirname(path)
+    if directory:
+      os.makedirs(directory, exist_ok=True)
+    # Batch runs write from several processes at once
+    self._connection = sqlite3.connect(path, timeout=30,
+                                       check_same_thread=False)
+    with self._connection:
+      self._connection.execute(
+          'CREATE TABLE IF NOT EXISTS results ('
+          ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+          ' config_hash TEXT NOT NULL, run_date TEXT NOT NULL,'
+          ' created_at REAL NOT NULL, securities TEXT, start_date TEXT,'
+          ' end_date TEXT, expected_returns TEXT, risk_model TEXT,'
+          ' objective TEXT, weight_bounds TEXT, total_portfolio_value REAL,'
+          ' expected_annual_return REAL, annual_volatility REAL,'
+          ' sharpe_ratio REAL, leftover REAL, total_seconds REAL,'
+          ' config TEXT NOT NULL, result TEXT NOT NULL, timings TEXT)')
+      self._connection.execute(
+          'CREATE INDEX IF NOT EXISTS results_by_config'
+          ' ON results (config_hash, created_at)')
+      self._connection.execute(
+          'CREATE INDEX IF NOT EXISTS results_by_date ON results (run_date)')
+
+  def close(self):
+    self._connection.close()
+
+  def save(self, config, result, timings=None):
+    """
+    Accepts a config dictionary, the result dictionary optimize_portfolio
+    returned for it and optionally a dictionary of timings (in seconds).
+    Stores the run and returns its INT id.
+    """
+
+    key = config_hash(config)
+    now = time.time()
+    result_json = json.dumps(result)
+    performance = result.get('performance', {})
+    timings = timings or {}
+
+    row = (key, datetime.date.today().isoformat(), now,
+           _json_or_none(config.get('securities')),
+           _date_or_none(config.get('start_date')),
+           _date_or_none(config.get('end_date')),
+           config.get('expected_returns'), config.get('risk_model'),
+           config.get('objective'),
+           _json_or_none(config.get('weight_bounds')),
+           result.get('total_portfolio_value'),
+           performance.get('expected_annual_return'),
+           performance.get('annual_volatility'),
+           performance.get('sharpe_ratio'), result.get('leftover'),
+           timings.get('total_seconds'),
+           json.dumps(config, sort_keys=True, default=str), result_json,
+           json.dumps(timings))
+
+    with self._lock:
+      with self._connection:
+        cursor = self._connection.execute(
+            'INSERT INTO results (config_hash, run_date, created_at,'
+            ' securities, start_date, end_date, expected_returns,'
+            ' risk_model, objective, weight_bounds, total_portfolio_value,'
+            ' expected_annual_return, annual_volatility, sharpe_ratio,'
+            ' leftover, total_seconds, config, result, timings)'
+            ' VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            row)
+      self._remember(key, now, result_json)
+
+    return cursor.lastrowid
+
+  def lookup(self, config, max_age=None):
+    """
+    Accepts a config dictionary and optionally a maximum age in seconds
+    (the store's by default). Returns the latest stored result dictionary
+    of the same config, or None.
+    """
+
+    key = config_hash(config)
+    if max_age is None:
+      max_age = self.max_age
+    oldest = None if max_age is None else time.time() - max_age
+
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is None:
+        entry = self._connection.execute(
+            'SELECT created_at, result FROM results WHERE config_hash = ?'
+            ' ORDER BY created_at DESC LIMIT 1', (key,)).fetchone()
+        if entry is not None:
+          self._remember(key, *entry)
+      else:
+        self._entries.move_to_end(key)
+
+    if entry is None or (oldest is not None and entry[0] < oldest):
+      return None
+    # Decoded on every hit, so callers can change what they get
+    return json.loads(entry[1])
+
+  def history(self, config=None, start_date=None, end_date=None):
+    """
+    Accepts an optional config dictionary and start and end dates of the
+    runs. Returns a pandas dataframe of the matching runs (all of them by
+    default), oldest first, one row per run with its inputs, performance
+    and total time.
+    """
+
+    conditions, parameters = [], []
+    if config is not None:
+      conditions.append('config_hash = ?')
+      parameters.append(config_hash(config))
+    if start_date is not None:
+      conditions.append('run_date >= ?')
+      parameters.append(pd.Timestamp(start_date).date().isoformat())
+    if end_date is not None:
+      conditions.append('run_date <= ?')
+      parameters.append(pd.Timestamp(end_date).date().isoformat())
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+
+    with self._lock:
+      rows = self._connection.execute(
+          f"SELECT {', '.join(HISTORY_COLUMNS)} FROM results{where}"
+          ' ORDER BY created_at, id', parameters).fetchall()
+
+    return pd.DataFrame(rows, columns=HISTORY_COLUMNS)
+
+  def get(self, run_id):
+    """
+    Accepts the INT id of a run. Returns a dictionary of its 'config',
+    'result' and 'timings' dictionaries.
+    """
+
+    with self._lock:
+      row = self._connection.execute(
+          'SELECT config, result, timings FROM results WHERE id = ?',
+          (run_id,)).fetchone()
+    if row is None:
+      raise KeyError(f'No stored run {run_id}')
+
+    return {name: json.loads(value) if value is not None else None
+            for name, value in zip(('config', 'result', 'timings'), row)}
+
+  def _remember(self, key, created_at, result_json):
+    self._entries[key] = (created_at, result_json)
+    self._entries.move_to_end(key)
+    while len(self._entries) > self.max_entries:
+      self._entries.popitem(last=False)
@@ -0,0 +1,439 @@
+"""Rolling estimators.
+
+Keep running sums of daily returns so that the expected returns and the
+covariance matrices can be updated when new days of prices arrive (or,
+for a moving window, when old days leave), instead of being recomputed
+from the whole history. The results match the PyPortfolioOpt estimators
+the calculator uses.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def _centred_exp_cov(weighted_cross_mean, weighted_mean, mean):
+  # The weighted mean of (r - mean)(r - mean)^T, from the weighted means of
+  # r r^T and r and the plain mean
+  return (weighted_cross_mean - np.outer(mean, weighted_mean)
+          - np.outer(weighted_mean, mean) + np.outer(mean, mean))
+
+
+class IncrementalEstimator:
+  """
+  Expanding-window estimator fed with new rows of prices as they arrive.
+  Each new day costs O(n^2): the mean and the sample covariance are updated
+  with Welford's rank-one update, the exponentially weighted mean and
+  covariance with their decay recursions. It gives the same results as the
+  mean, EMA and CAPM expected returns and the sample, exponentially
+  weighted and Ledoit-Wolf covariance of the calculator (with log_returns,
+  the same as their log_returns=True versions).
+
+  The exponentially weighted covariance of risk_models.exp_cov weights the
+  cross products of the returns around their plain (unweighted) mean, so
+  the weighted sums of the returns and of their cross products are kept and
+  centred when the covariance is asked for. The Ledoit-Wolf shrinkage also
+  needs the sum of the squared norms of the centred daily returns, which is
+  expanded into sums of powers of the raw returns for the same reason.
+
+  For a moving window, add_returns() and remove_returns() add the newest
+  days of returns and take the oldest ones out again, every sum being
+  updated in the same O(n^2) per day.
+  """
+
+  def __init__(self, tickers, returns_span=500, covariance_span=180,
+               frequency=252, log_returns=False):
+    self.tickers = list(tickers)
+    self.returns_span = returns_span
+    self.covariance_span = covariance_span
+    self.frequency = frequency
+    self.log_returns = log_returns
+    size = len(self.tickers) + 1
+
+    self.last_prices = None
+    self.count = 0
+    self.mean = np.zeros(size)
+    self.squared_deviations = np.zeros((size, size))
+    self.log_sum = np.zeros(size)
+
+    # Sums of q, q^2 and q * returns, where q is the squared norm of the
+    # returns of the stocks (not the market) on each day
+    self.norm_sum = 0.0
+    self.squared_norm_sum = 0.0
+    self.norm_weighted_sum = np.zeros(size - 1)
+
+    self.returns_decay = 1 - 2 / (returns_span + 1)
+    self.returns_weighted_sum = np.zeros(size)
+    self.returns_weight = 0.0
+
+    self.covariance_decay = 1 - 2 / (covariance_span + 1)
+    self.covariance_weighted_sum = np.zeros(size)
+    self.covariance_weighted_cross_sum = np.zeros((size, size))
+    self.covariance_weight = 0.0
+
+  @classmethod
+  def from_prices(cls, daily_adjclose_df, chunk_rows=1024, **kwargs):
+    """
+    Accepts the price dataframe and the estimator settings. Returns an
+    IncrementalEstimator that has ingested all of it, chunk_rows days at a
+    time, so that no intermediate array is ever larger than one chunk.
+    """
+
+    estimator = cls(daily_adjclose_df.columns, **kwargs)
+    values = daily_adjclose_df.to_numpy()
+    for start in range(0, len(values), chunk_rows):
+      estimator.update(values[start:start + chunk_rows])
+    return estimator
+
+  def update(self, prices):
+    """
+    Accepts one or more new rows of prices (a pandas Series/dataframe or a
+    numpy array, in the order of the tickers) and adds their returns.
+    Raises a ValueError if a price is missing, since the estimators would
+    then need pairwise sums.
+    """
+
+    prices = np.atleast_2d(np.asarray(prices, dtype='float64'))
+    if np.isnan(prices).any():
+      raise ValueError('Missing prices cannot be added incrementally')
+    if self.last_prices is not None:
+      prices = np.vstack([self.last_prices, prices])
+    self.last_prices = prices[-1].copy()
+    if len(prices) < 2:
+      return
+
+    if self.log_returns:
+      returns = np.log(prices[1:] / prices[:-1])
+    else:
+      returns = prices[1:] / prices[:-1] - 1
+    self.add_returns(returns)
+
+  def add_returns(self, returns):
+    """
+    Accepts an array of one or more new days of returns (rows are days,
+    columns are stocks), the newest last, and adds them to the window.
+    """
+
+    returns = np.atleast_2d(np.asarray(returns, dtype='float64'))
+    if not len(returns):
+      return
+    norms = np.einsum('ij,ij->i', returns, returns)
+    self.norm_sum += norms.sum()
+    self.squared_norm_sum += norms @ norms
+    self.norm_weighted_sum += norms @ returns
+    returns = np.hstack([returns, returns.mean(axis=1, keepdims=True)])
+    new_count = len(returns)
+
+    # Merge the new days into the mean and the sum of squared deviations
+    # (Welford's update for a single day, Chan et al.'s for a batch)
+    new_mean = returns.mean(axis=0)
+    centred = returns - new_mean
+    delta = new_mean - self.mean
+    total_count = self.count + new_count
+    self.squared_deviations += (centred.T @ centred
+                                + np.outer(delta, delta)
+                                * self.count * new_count / total_count)
+    self.mean += delta * new_count / total_count
+    self.count = total_count
+    self.log_sum += np.log1p(returns).sum(axis=0)
+
+    # Exponentially weighted sums: the newest day has weight 1 and every
+    # older day is multiplied by the decay once per new day
+    returns_weights = self.returns_decay ** np.arange(new_count - 1, -1, -1)
+    self.returns_weighted_sum = (self.returns_decay ** new_count
+                                 * self.returns_weighted_sum
+                                 + returns_weights @ returns)
+    self.returns_weight = (self.returns_decay ** new_count
+                           * self.returns_weight + returns_weights.sum())
+
+    covariance_weights = self.covariance_decay ** np.arange(new_count - 1, -1,
+                                                            -1)
+    decay = self.covariance_decay ** new_count
+    self.covariance_weighted_sum = (decay * self.covariance_weighted_sum
+                                    + covariance_weights @ returns)
+    self.covariance_weighted_cross_sum = (
+        decay * self.covariance_weighted_cross_sum
+        + (returns * covariance_weights[:, None]).T @ returns)
+    self.covariance_weight = (decay * self.covariance_weight
+                              + covariance_weights.sum())
+
+  def remove_returns(self, returns):
+    """
+    Accepts an array of the oldest days of returns in the window, the
+    oldest first, and takes them out of it.
+    """
+
+    returns = np.atleast_2d(np.asarray(returns, dtype='float64'))
+    if not len(returns):
+      return
+    if len(returns) >= self.count:
+      raise ValueError('Cannot remove every day of the window')
+    norms = np.einsum('ij,ij->i', returns, returns)
+    self.norm_sum -= norms.sum()
+    self.squared_norm_sum -= norms @ norms
+    self.norm_weighted_sum -= norms @ returns
+    returns = np.hstack([returns, returns.mean(axis=1, keepdims=True)])
+    old_count = len(returns)
+
+    # Chan et al.'s merge of the remaining days with the removed ones,
+    # solved for the remaining days
+    old_mean = returns.mean(axis=0)
+    centred = returns - old_mean
+    remaining_count = self.count - old_count
+    remaining_mean = (self.mean * self.count
+                      - old_mean * old_count) / remaining_count
+    delta = old_mean - remaining_mean
+    self.squared_deviations -= (centred.T @ centred
+                                + np.outer(delta, delta)
+                                * remaining_count * old_count / self.count)
+    self.mean = remaining_mean
+    self.log_sum -= np.log1p(returns).sum(axis=0)
+
+    # The oldest day has been decayed once per later day
+    ages = np.arange(self.count - 1, remaining_count - 1, -1)
+    self.count = remaining_count
+    returns_weights = self.returns_decay ** ages
+    self.returns_weighted_sum -= returns_weights @ returns
+    self.returns_weight -= returns_weights.sum()
+    covariance_weights = self.covariance_decay ** ages
+    self.covariance_weighted_sum -= covariance_weights @ returns
+    self.covariance_weighted_cross_sum -= (
+        (returns * covariance_weights[:, None]).T @ returns)
+    self.covariance_weight -= covariance_weights.sum()
+
+  def _sample_covariance(self):
+    return self.squared_deviations / (self.count - 1)
+
+  def mean_historical_return(self):
+    """
+    Returns a pandas Series like expected_returns.mean_historical_return
+    """
+
+    return pd.Series(np.expm1(self.log_sum[:-1] * self.frequency
+                              / self.count), index=self.tickers)
+
+  def ema_historical_return(self):
+    """
+    Returns a pandas Series like expected_returns.ema_historical_return
+    """
+
+    ema = self.returns_weighted_sum[:-1] / self.returns_weight
+    return pd.Series((1 + ema) ** self.frequency - 1, index=self.tickers)
+
+  def capm_return(self, risk_free_rate=0.0):
+    """
+    Returns a pandas Series like expected_returns.capm_return against the
+    equally weighted market
+    """
+
+    covariance = self._sample_covariance()
+    betas = covariance[:-1, -1] / covariance[-1, -1]
+    market_return = np.expm1(self.log_sum[-1] * self.frequency / self.count)
+    return pd.Series(risk_free_rate + betas * (market_return - risk_free_rate),
+                     index=self.tickers)
+
+  def sample_cov(self):
+    """
+    Returns a pandas dataframe like risk_models.sample_cov (before its
+    positive semidefinite fix)
+    """
+
+    covariance = self._sample_covariance()[:-1, :-1] * self.frequency
+    return pd.DataFrame(covariance, index=self.tickers, columns=self.tickers)
+
+  def exp_cov(self):
+    """
+    Returns a pandas dataframe like risk_models.exp_cov (before its positive
+    semidefinite fix)
+    """
+
+    covariance = _centred_exp_cov(
+        self.covariance_weighted_cross_sum[:-1, :-1] / self.covariance_weight,
+        self.covariance_weighted_sum[:-1] / self.covariance_weight,
+        self.mean[:-1])
+    return pd.DataFrame(covariance * self.frequency, index=self.tickers,
+                        columns=self.tickers)
+
+  def ledoit_wolf(self):
+    """
+    Returns a pandas dataframe like risk_models.risk_matrix with
+    method='ledoit_wolf_constant_variance' (before its positive
+    semidefinite fix), i.e. scikit-learn's Ledoit-Wolf shrinkage of the
+    biased sample covariance towards its average variance
+    """
+
+    n_days, n_stocks = self.count, len(self.tickers)
+    covariance = self.squared_deviations[:-1, :-1] / n_days
+    average_variance = np.trace(covariance) / n_stocks
+
+    shrinkage = 0.0
+    if n_stocks > 1:
+      # Sum over the days of the squared norm of the centred returns,
+      # squared: sum((q - 2 r.m + |m|^2)^2) expanded over the raw sums
+      mean = self.mean[:-1]
+      mean_norm = mean @ mean
+      raw_cross_sum = (self.squared_deviations[:-1, :-1]
+                       + n_days * np.outer(mean, mean))
+      fourth_moment_sum = (self.squared_norm_sum
+                           + 4 * mean @ raw_cross_sum @ mean
+                           - 3 * n_days * mean_norm ** 2
+                           - 4 * mean @ self.norm_weighted_sum
+                           + 2 * mean_norm * self.norm_sum)
+
+      squared_covariance_sum = np.sum(covariance ** 2)
+      beta = ((fourth_moment_sum / n_days - squared_covariance_sum)
+              / (n_stocks * n_days))
+      delta = (squared_covariance_sum
+               - n_stocks * average_variance ** 2) / n_stocks
+      beta = min(beta, delta)
+      shrinkage = 0.0 if beta == 0 else beta / delta
+
+    shrunk_covariance = (1 - shrinkage) * covariance
+    shrunk_covariance[np.diag_indices(n_stocks)] += (shrinkage
+                                                     * average_variance)
+    return pd.DataFrame(shrunk_covariance * self.frequency,
+                        index=self.tickers, columns=self.tickers)
+
+  def expected_returns(self, method):
+    """
+    Accepts the name of an expected returns method ('mean', 'ema' or
+    'capm'). Returns what pipeline.estimate_expected_returns would
+    """
+
+    if method == 'mean':
+      return self.mean_historical_return()
+    elif method == 'ema':
+      return self.ema_historical_return()
+    elif method == 'capm':
+      return self.capm_return()
+    raise ValueError(f"Unknown expected returns method '{method}'")
+
+  def risk_model(self, method):
+    """
+    Accepts the name of a risk model ('sample', 'exponential' or
+    'ledoit_wolf'). Returns what pipeline.estimate_risk_model would, fixed
+    to be positive semidefinite
+    """
+
+    if method == 'sample':
+      covariance_matrix = self.sample_cov()
+    elif method == 'exponential':
+      covariance_matrix = self.exp_cov()
+    elif method == 'ledoit_wolf':
+      covariance_matrix = self.ledoit_wolf()
+    else:
+      raise ValueError(f"Unknown risk model '{method}'")
+
+    from pypfopt import risk_models
+
+    return risk_models.fix_nonpositive_semidefinite(covariance_matrix)
+
+
+class MultiSpanEstimator:
+  """
+  The EMA expected returns and (unless covariance is false) the
+  exponentially weighted covariance for several spans at once, from a
+  single pass over the prices. The returns and their plain mean are
+  computed once for all the spans, and the decayed sums of every span are
+  updated together, the EMA sums in one matrix product. Gives the same
+  results as expected_returns.ema_historical_return and risk_models.exp_cov
+  called with each span.
+  """
+
+  def __init__(self, tickers, spans, frequency=252, log_returns=False,
+               covariance=True):
+    self.tickers = list(tickers)
+    self.spans = [int(days) for days in spans]
+    self.frequency = frequency
+    self.log_returns = log_returns
+    n_spans, n_stocks = len(self.spans), len(self.tickers)
+
+    self.last_prices = None
+    self.count = 0
+    self.sum = np.zeros(n_stocks)
+    self.decays = np.array([1 - 2 / (days + 1) for days in self.spans])
+    self.weights = np.zeros(n_spans)
+    self.weighted_sums = np.zeros((n_spans, n_stocks))
+    self.weighted_cross_sums = (np.zeros((n_spans, n_stocks, n_stocks))
+                                if covariance else None)
+
+  @classmethod
+  def from_prices(cls, daily_adjclose_df, spans, chunk_rows=1024, **kwargs):
+    """
+    Accepts the price dataframe, the LIST of spans and the estimator
+    settings. Returns a MultiSpanEstimator that has ingested all of it,
+    chunk_rows days at a time.
+    """
+
+    estimator = cls(daily_adjclose_df.columns, spans, **kwargs)
+    values = daily_adjclose_df.to_numpy()
+    for start in range(0, len(values), chunk_rows):
+      estimator.update(values[start:start + chunk_rows])
+    return estimator
+
+  def update(self, prices):
+    """
+    Accepts one or more new rows of prices, like IncrementalEstimator.update
+    """
+
+    prices = np.atleast_2d(np.asarray(prices, dtype='float64'))
+    if np.isnan(prices).any():
+      raise ValueError('Missing prices cannot be added incrementally')
+    if self.last_prices is not None:
+      prices = np.vstack([self.last_prices, prices])
+    self.last_prices = prices[-1].copy()
+    if len(prices) < 2:
+      return
+
+    if self.log_returns:
+      returns = np.log(prices[1:] / prices[:-1])
+    else:
+      returns = prices[1:] / prices[:-1] - 1
+    new_count = len(returns)
+    self.count += new_count
+    self.sum += returns.sum(axis=0)
+
+    # Row i holds the weight of every new day for span i, the newest day
+    # having weight 1
+    day_weights = self.decays[:, None] ** np.arange(new_count - 1, -1, -1)
+    decay = self.decays ** new_count
+    self.weights = decay * self.weights + day_weights.sum(axis=1)
+    self.weighted_sums = (decay[:, None] * self.weighted_sums
+                          + day_weights @ returns)
+    if self.weighted_cross_sums is not None:
+      for number, weights in enumerate(day_weights):
+        self.weighted_cross_sums[number] *= decay[number]
+        self.weighted_cross_sums[number] += (returns * weights[:, None]).T \
+                                            @ returns
+
+  def _span_number(self, days):
+    try:
+      return self.spans.index(int(days))
+    except ValueError:
+      raise KeyError(f'No estimate for a span of {days} days') from None
+
+  def ema_historical_return(self, days):
+    """
+    Accepts one of the spans. Returns a pandas Series like
+    expected_returns.ema_historical_return with that span
+    """
+
+    number = self._span_number(days)
+    ema = self.weighted_sums[number] / self.weights[number]
+    return pd.Series((1 + ema) ** self.frequency - 1, index=self.tickers)
+
+  def exp_cov(self, days):
+    """
+    Accepts one of the spans. Returns a pandas dataframe like
+    risk_models.exp_cov with that span (before its positive semidefinite
+    fix)
+    """
+
+    if self.weighted_cross_sums is None:
+      raise ValueError('This estimator was built without the covariances')
+    number = self._span_number(days)
+    covariance = _centred_exp_cov(
+        self.weighted_cross_sums[number] / self.weights[number],
+        self.weighted_sums[number] / self.weights[number],
+        self.sum / self.count)
+    return pd.DataFrame(covariance * self.frequency, index=self.tickers,
+                        columns=self.tickers)
@@ -0,0 +1,190 @@
+"""Historical stress scenarios.
+
+Replays crisis windows of the price history (the 2008 financial crisis, the
+March 2020 crash...) on portfolios: a scenario is a named (start, end) date
+window, and its P&L is what a portfolio bought at the close of the last
+trading day on or before the start would have gained or lost by the close
+of the last trading day on or before the end, without rebalancing.
+
+Without rebalancing, the return of a portfolio over a window is exactly
+weights @ returns, with returns the return of every stock over that window.
+So the price panel is only read once, to gather the prices at the two ends
+of every scenario into a (scenarios x stocks) matrix of window returns, and
+a whole (portfolios x stocks) matrix of weights is evaluated against every
+scenario in a single matrix product: 10,000 portfolios and 50 scenarios
+take milliseconds.
+
+A stock without a price at both ends of a scenario (not listed yet, or
+delisted) counts as cash there, and the share of each portfolio that was
+covered is reported along with its P&L.
+"""
+
+import numpy as np
+import pandas as pd
+
+from portfolio_optimizer.instrumentation import span
+
+# The default library: well known drawdowns of the US market
+SCENARIOS = {
+    'dot_com_crash': ('2000-03-24', '2002-10-09'),
+    'september_2001': ('2001-09-10', '2001-09-21'),
+    'global_financial_crisis': ('2007-10-09', '2009-03-09'),
+    'lehman_collapse': ('2008-09-12', '2008-10-10'),
+    'flash_crash': ('2010-05-05', '2010-05-06'),
+    'us_downgrade': ('2011-07-22', '2011-10-03'),
+    'china_devaluation': ('2015-08-10', '2015-08-25'),
+    'volatility_spike_2018': ('2018-01-26', '2018-02-08'),
+    'fourth_quarter_2018': ('2018-09-20', '2018-12-24'),
+    'covid_crash': ('2020-02-19', '2020-03-23'),
+    'inflation_bear_2022': ('2022-01-03', '2022-10-12'),
+    'regional_banks_2023': ('2023-03-08', '2023-03-17'),
+}
+
+
+def parse_scenarios(scenarios=None):
+  """
+  Accepts the scenarios as a dictionary of names and (start, end) pairs
+  (or dictionaries with 'start' and 'end'), or a LIST of dictionaries with
+  'name', 'start' and 'end'; None for the default library. Returns a
+  pandas dataframe of the 'start' and 'end' timestamps indexed by name (an
+  already parsed one is returned as it is).
+  """
+
+  if isinstance(scenarios, pd.DataFrame):
+    return scenarios
+  if scenarios is None:
+    scenarios = SCENARIOS
+  if isinstance(scenarios, dict):
+    scenarios = [{'name': name,
+                  **(window if isinstance(window, dict)
+                     else {'start': window[0], 'end': window[1]})}
+                 for name, window in scenarios.items()]
+  if not scenarios:
+    raise ValueError('Expected at least one scenario')
+
+  scenarios_df = pd.DataFrame(
+      {'start': pd.to_datetime([scenario['start'] for scenario in scenarios]),
+       'end': pd.to_datetime([scenario['end'] for scenario in scenarios])},
+      index=pd.Index([str(scenario['name']) for scenario in scenarios],
+                     name='scenario'))
+  duplicates = scenarios_df.index[scenarios_df.index.duplicated()]
+  if len(duplicates):
+    raise ValueError(f'Duplicate scenario names: {sorted(set(duplicates))}')
+  reversed_windows = scenarios_df.index[scenarios_df['end']
+                                        <= scenarios_df['start']]
+  if len(reversed_windows):
+    raise ValueError('Scenarios ending before they start:'\
+                     f' {list(reversed_windows)}')
+  return scenarios_df
+
+
+def scenario_returns(daily_adjclose_df, scenarios_df):
+  """
+  Accepts the price dataframe and the scenarios (see parse_scenarios).
+  Returns a dictionary of the (scenarios x stocks) numpy array of the
+  'returns' of every stock over every scenario (NaN without a price at
+  both ends), and of the 'start_dates' and 'end_dates' actually used (NaT
+  when the prices do not cover the scenario).
+  """
+
+  dates = daily_adjclose_df.index
+  # A missing day takes the price of the day before, as in the allocation
+  prices = daily_adjclose_df.ffill().to_numpy(dtype='float64')
+
+  # The last trading day on or before each end of every window
+  starts = dates.searchsorted(scenarios_df['start'].to_numpy(),
+                              side='right') - 1
+  ends = dates.searchsorted(scenarios_df['end'].to_numpy(), side='right') - 1
+  covered = (starts >= 0) & (ends > starts)
+
+  with np.errstate(divide='ignore', invalid='ignore'):
+    returns = prices[ends] / prices[starts] - 1
+  returns[~covered] = np.nan
+
+  return {'returns': returns,
+          'start_dates': pd.DatetimeIndex(np.where(covered, dates[starts],
+                                                   pd.NaT)),
+          'end_dates': pd.DatetimeIndex(np.where(covered, dates[ends],
+                                                 pd.NaT))}
+
+
+def weight_matrix(weights, tickers):
+  """
+  Accepts the weights of one portfolio (a dictionary of tickers) or of many
+  (a dataframe with one column per ticker, or an array in the order of
+  tickers) and the LIST of tickers of the prices. Returns the (portfolios x
+  stocks) numpy array of weights, zero for the tickers a portfolio does not
+  hold.
+  """
+
+  if isinstance(weights, dict):
+    weights = pd.DataFrame([weights])
+  if isinstance(weights, pd.DataFrame):
+    unknown = [ticker for ticker in weights.columns if ticker not in tickers]
+    if unknown:
+      raise KeyError(f'No prices for the tickers {unknown}')
+    weights = weights.reindex(columns=tickers, fill_value=0.0).fillna(0.0)
+  weights = np.atleast_2d(np.asarray(weights, dtype='float64'))
+  if weights.shape[1] != len(tickers):
+    raise ValueError(f'Expected weights of {len(tickers)} stocks, got'\
+                     f' {weights.shape[1]}')
+  return weights
+
+
+def scenario_pnl(weights, returns, total_portfolio_value=1.0):
+  """
+  Accepts the (portfolios x stocks) array of weights, the (scenarios x
+  stocks) array of window returns and the FLOAT total portfolio value.
+  Returns a tuple of the (portfolios x scenarios) arrays of the P&L, in the
+  currency of the portfolio, and of the share of each portfolio covered by
+  the prices of each scenario.
+  """
+
+  available = ~np.isnan(returns)
+  with span('scenario_pnl', portfolios=len(weights), scenarios=len(returns),
+            assets=weights.shape[1]):
+    pnl = weights @ np.where(available, returns, 0.0).T
+    pnl *= total_portfolio_value
+    gross_weights = np.abs(weights)
+    with np.errstate(divide='ignore', invalid='ignore'):
+      coverage = (gross_weights @ available.T) / gross_weights.sum(
+          axis=1, keepdims=True)
+  # Scenarios outside the prices have no P&L at all
+  pnl[:, ~available.any(axis=1)] = np.nan
+  return pnl, coverage
+
+
+def stress_test(weights, daily_adjclose_df, scenarios=None,
+                total_portfolio_value=1.0):
+  """
+  Accepts the weights of one or many portfolios (see weight_matrix), the
+  price dataframe, the scenarios (see parse_scenarios) and the FLOAT total
+  portfolio value. Returns a dictionary of pandas dataframes indexed by
+  portfolio with one column per scenario: 'pnl' in the currency of the
+  portfolio, 'returns' as fractions and 'coverage'; plus 'scenarios', the
+  dataframe of the requested and the actual start and end dates of every
+  scenario.
+  """
+
+  scenarios_df = parse_scenarios(scenarios)
+  index = weights.index if isinstance(weights, pd.DataFrame) else None
+  weights = weight_matrix(weights, list(daily_adjclose_df.columns))
+  if index is None:
+    index = pd.RangeIndex(len(weights), name='portfolio')
+
+  with span('stress_test', portfolios=len(weights),
+            scenarios=len(scenarios_df)):
+    with span('scenario_returns', scenarios=len(scenarios_df),
+              assets=daily_adjclose_df.shape[1]):
+      windows = scenario_returns(daily_adjclose_df, scenarios_df)
+    pnl, coverage = scenario_pnl(weights, windows['returns'],
+                                 total_portfolio_value)
+
+  def frame(values):
+    return pd.DataFrame(values, index=index, columns=scenarios_df.index)
+
+  return {'pnl': frame(pnl), 'returns': frame(pnl / total_portfolio_value),
+          'coverage': frame(coverage),
+          'scenarios': scenarios_df.assign(
+              first_date=windows['start_dates'],
+              last_date=windows['end_dates'])}
@@ -0,0 +1,252 @@
+"""Optimization service.
+
+A local HTTP/JSON front-end to the pipeline, so that other services can
+call the optimizer. It runs on asyncio with the standard library only:
+
+  POST /optimize   a config (see pipeline.optimize_portfolio) as the JSON
+                   body, answered with the result dictionary
+  GET  /health     {"status": "ok"}
+  GET  /stats      request, coalescing and cache counters
+
+The solves are CPU-bound, so they run on a pool of worker processes (or
+threads) while the event loop keeps accepting requests. Identical configs
+requested while one is already being solved are coalesced: they wait for
+the same solve instead of starting another one.
+
+The workers stay alive between requests, so their caches stay warm: each
+keeps the price dataframes of the last configs it loaded and the
+process-wide estimator cache, and they all share the on-disk price cache
+and, when the service is given one, an on-disk estimator cache directory.
+With the 'data_dir' default the prices come from local fixture files, and
+the whole service can be exercised on localhost without any network.
+"""
+
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http import HTTPStatus
+
+from portfolio_optimizer.batch import PRICE_KEYS
+from portfolio_optimizer.pipeline import optimize_portfolio, load_prices
+from portfolio_optimizer.result_store import config_hash
+
+# Requests with a bigger body are refused
+MAX_BODY_BYTES = 1024 * 1024
+
+# Worker processes are not forked from the server: they would inherit its
+# listening socket and every open client socket, which then never close
+WORKER_START_METHOD = ('forkserver' if 'forkserver'
+                       in multiprocessing.get_all_start_methods() else 'spawn')
+
+# Price dataframes kept by each worker, for the most recent price configs
+WORKER_PRICE_FRAMES = 8
+
+_worker_prices = OrderedDict()
+_worker_prices_lock = threading.Lock()
+
+
+def _worker_price_frame(config):
+  key = json.dumps({key: config.get(key) for key in PRICE_KEYS},
+                   sort_keys=True, default=str)
+  with _worker_prices_lock:
+    if key in _worker_prices:
+      _worker_prices.move_to_end(key)
+      return _worker_prices[key]
+
+  daily_adjclose_df = load_prices(config)
+  with _worker_prices_lock:
+    _worker_prices[key] = daily_adjclose_df
+    while len(_worker_prices) > WORKER_PRICE_FRAMES:
+      _worker_prices.popitem(last=False)
+  return daily_adjclose_df
+
+
+def optimize_in_worker(config):
+  """
+  Accepts a config. Runs the pipeline on it in a worker, reusing the
+  worker's price dataframes. Returns the result dictionary.
+  """
+
+  return optimize_portfolio(config, _worker_price_frame(config))
+
+
+class OptimizationService:
+  """
+  Accepts optional default config keys (e.g. data_dir, price_cache,
+  estimator_cache_dir, result_store) applied under every request, the
+  number of workers (one per CPU by default) and whether the workers are
+  threads instead of processes.
+  """
+
+  def __init__(self, defaults=None, max_workers=None, use_threads=False):
+    self.defaults = dict(defaults or {})
+    max_workers = max_workers or os.cpu_count()
+    if use_threads:
+      self.executor = ThreadPoolExecutor(max_workers=max_workers)
+    else:
+      self.executor = ProcessPoolExecutor(
+          max_workers=max_workers,
+          mp_context=multiprocessing.get_context(WORKER_START_METHOD))
+    self.stats = {'requests': 0, 'solves': 0, 'coalesced': 0, 'errors': 0}
+    self._in_flight = {}
+    self._server = None
+
+  async def optimize(self, config):
+    """
+    Accepts a request config. Returns its result dictionary, solved on the
+    worker pool unless the same config is already being solved.
+    """
+
+    config = {**self.defaults, **config}
+    key = config_hash(config)
+    if key in self._in_flight:
+      self.stats['coalesced'] += 1
+      return await asyncio.shield(self._in_flight[key])
+
+    self.stats['solves'] += 1
+    loop = asyncio.get_running_loop()
+    solve = loop.run_in_executor(self.executor, optimize_in_worker, config)
+    self._in_flight[key] = solve
+    try:
+      return await asyncio.shield(solve)
+    finally:
+      del self._in_flight[key]
+
+  async def handle(self, method, path, body):
+    """
+    Accepts the method, path and body bytes of a request. Returns a tuple
+    of the HTTP status and the JSON-serializable answer.
+    """
+
+    self.stats['requests'] += 1
+    path = path.split('?', 1)[0]
+    if path == '/health':
+      return HTTPStatus.OK, {'status': 'ok'}
+    if path == '/stats':
+      return HTTPStatus.OK, {**self.stats, 'in_flight': len(self._in_flight)}
+    if path != '/optimize':
+      return HTTPStatus.NOT_FOUND, {'error': f'No such endpoint: {path}'}
+    if method != 'POST':
+      return HTTPStatus.METHOD_NOT_ALLOWED, {'error': 'Use POST'}
+
+    try:
+      config = json.loads(body or b'{}')
+      if not isinstance(config, dict):
+        raise ValueError('The body must be a JSON object')
+    except ValueError as error:
+      return HTTPStatus.BAD_REQUEST, {'error': f'Invalid JSON: {error}'}
+
+    from pypfopt import exceptions
+
+    try:
+      return HTTPStatus.OK, await self.optimize(config)
+    except (ValueError, KeyError, exceptions.OptimizationError) as error:
+      self.stats['errors'] += 1
+      return HTTPStatus.BAD_REQUEST, {
+          'error': f'{type(error).__name__}: {error}'}
+    except Exception as error:
+      self.stats['errors'] += 1
+      return HTTPStatus.INTERNAL_SERVER_ERROR, {
+          'error': f'{type(error).__name__}: {error}'}
+
+  async def _handle_connection(self, reader, writer):
+    try:
+      while True:
+        request_line = await reader.readline()
+        if not request_line.strip():
+          break
+        try:
+          method, path, version = request_line.decode('latin-1').split()
+        except ValueError:
+          await self._respond(writer, HTTPStatus.BAD_REQUEST,
+                              {'error': 'Malformed request line'}, False)
+          break
+
+        headers = {}
+        while True:
+          line = await reader.readline()
+          if line in (b'\r\n', b'\n', b''):
+            break
+          name, _, value = line.decode('latin-1').partition(':')
+          headers[name.strip().lower()] = value.strip()
+        keep_alive = (version == 'HTTP/1.1'
+                      and headers.get('connection', '').lower() != 'close')
+
+        try:
+          length = int(headers.get('content-length', 0) or 0)
+          if length < 0:
+            raise ValueError
+        except ValueError:
+          await self._respond(writer, HTTPStatus.BAD_REQUEST,
+                              {'error': 'Invalid Content-Length'}, False)
+          break
+        if length > MAX_BODY_BYTES:
+          await self._respond(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                              {'error': 'Request body too large'}, False)
+          break
+        body = await reader.readexactly(length) if length else b''
+
+        status, answer = await self.handle(method.upper(), path, body)
+        await self._respond(writer, status, answer, keep_alive)
+        if not keep_alive:
+          break
+    except (asyncio.IncompleteReadError, ConnectionError):
+      pass
+    finally:
+      writer.close()
+
+  async def _respond(self, writer, status, answer, keep_alive):
+    body = json.dumps(answer).encode()
+    head = (f'HTTP/1.1 {status.value} {status.phrase}\r\n'
+            'Content-Type: application/json\r\n'
+            f'Content-Length: {len(body)}\r\n'
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+            '\r\n')
+    writer.write(head.encode('latin-1') + body)
+    await writer.drain()
+
+  async def start(self, host='127.0.0.1', port=8000):
+    """
+    Accepts the host and port to listen on (port 0 picks a free one).
+    Starts serving. Returns the asyncio Server.
+    """
+
+    self._server = await asyncio.start_server(self._handle_connection, host,
+                                              port)
+    return self._server
+
+  async def close(self):
+    if self._server is not None:
+      self._server.close()
+      await self._server.wait_closed()
+    self.executor.shutdown(wait=True)
+
+
+def serve(host='127.0.0.1', port=8000, defaults=None, max_workers=None,
+          use_threads=False):
+  """
+  Accepts the host and port and the OptimizationService settings. Serves
+  until interrupted.
+  """
+
+  async def run():
+    service = OptimizationService(defaults, max_workers, use_threads)
+    server = await service.start(host, port)
+    address = server.sockets[0].getsockname()
+    print(f'Serving on http://{address[0]}:{address[1]}', flush=True)
+    try:
+      await server.serve_forever()
+    finally:
+      await service.close()
+
+  # Stopped like an interrupt, so that the worker processes are shut down
+  signal.signal(signal.SIGTERM, signal.default_int_handler)
+  try:
+    asyncio.run(run())
+  except KeyboardInterrupt:
+    pass
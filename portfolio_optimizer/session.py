@@ -0,0 +1,317 @@
+"""Optimizer session.
+
+A mean-variance optimizer that stays alive between solves, for what-if
+loops. The problem of each objective is built and compiled by cvxpy once,
+with the weight bounds, the L2 regularisation gamma, the risk-free rate
+and the targets of efficient_risk and efficient_return as cvxpy
+parameters. Changing any of them only updates the parameter values, and
+the next solve is warm-started from the previous solution.
+
+The problems are the ones EfficientFrontier builds (with the L2_reg
+objective build_efficient_frontier adds), and the session has the same
+max_sharpe(), min_volatility(), efficient_risk(), efficient_return() and
+portfolio_performance() methods, so that it can be used in its place.
+
+The session also has the solver-free hrp() of HRPOptimizer, so that the
+calculator can compare it with the other objectives.
+
+The covariance matrix can also be a FactorRiskModel, in which case the
+variance of the portfolio is written in factor form, as the squared norm
+of its factor exposures plus its specific variance, and the dense matrix
+is only built by hrp(), whose clustering needs the correlations.
+"""
+
+from collections import OrderedDict
+
+import cvxpy as cp
+import numpy as np
+from pypfopt import base_optimizer, exceptions
+
+from portfolio_optimizer.factor_model import FactorRiskModel
+from portfolio_optimizer.frontier import max_feasible_return
+from portfolio_optimizer.hrp import cluster_order, hrp_weights
+from portfolio_optimizer.instrumentation import span, solver_stats
+
+
+def bound_arrays(weight_bounds, n_assets):
+  """
+  Accepts the weight bounds (a (min, max) tuple for all stocks, a LIST of
+  one tuple per stock, or None for (0, 1)) and the number of stocks.
+  Returns a tuple of numpy arrays of the lower and upper bounds, a missing
+  bound being -1 or 1 like in EfficientFrontier.
+  """
+
+  if weight_bounds is None:
+    weight_bounds = (0, 1)
+  if isinstance(weight_bounds, tuple):
+    weight_bounds = [weight_bounds] * n_assets
+  if len(weight_bounds) != n_assets:
+    raise ValueError(f'Expected weight bounds for {n_assets} stocks, got'\
+                     f' {len(weight_bounds)}')
+
+  bounds = np.array(weight_bounds, dtype='float64')
+  return (np.nan_to_num(bounds[:, 0], nan=-1.0),
+          np.nan_to_num(bounds[:, 1], nan=1.0))
+
+
+class OptimizerSession:
+  """
+  Accepts mu, covariance_matrix (or a FactorRiskModel) and, optionally,
+  the weight bounds, the L2 regularisation gamma, the risk-free rate and the
+  name of the cvxpy solver to use. The bounds, gamma and the risk-free rate
+  can be changed between solves with set_weight_bounds(), set_gamma() and
+  set_risk_free_rate().
+
+  With parametric_inputs, mu and the covariance are cvxpy parameters too
+  (the covariance through a square root of it), so that set_inputs() can
+  replace them without compiling the problems again, e.g. for every sample
+  of a resampled frontier.
+  """
+
+  def __init__(self, mu, covariance_matrix, weight_bounds=None, gamma=0.1,
+               risk_free_rate=0.0, solver=None, parametric_inputs=False):
+    self.tickers = list(mu.index)
+    self.solver = solver
+    self.parametric_inputs = parametric_inputs
+    self.weights = None
+    self._opt = None
+    self._problems = {}
+
+    n_assets = len(self.tickers)
+    if parametric_inputs:
+      self._mu = cp.Parameter(n_assets)
+      self._covariance_root = cp.Parameter((n_assets, n_assets))
+    self._w = cp.Variable(n_assets)
+    self._k = cp.Variable()
+    self._lower_bounds = cp.Parameter(n_assets)
+    self._upper_bounds = cp.Parameter(n_assets)
+    self._gamma = cp.Parameter(nonneg=True)
+    self._risk_free_rate = cp.Parameter()
+    self._target_variance = cp.Parameter(nonneg=True)
+    self._target_return = cp.Parameter()
+
+    self.set_inputs(mu, covariance_matrix)
+    self.set_weight_bounds(weight_bounds)
+    self.set_gamma(gamma)
+    self.set_risk_free_rate(risk_free_rate)
+
+  def set_inputs(self, mu, covariance_matrix):
+    """
+    Accepts new mu and covariance_matrix (or FactorRiskModel) for the same
+    tickers. Only updates the parameters with parametric_inputs, otherwise
+    the problems are built again on the next solves.
+    """
+
+    if list(mu.index) != self.tickers:
+      raise ValueError('The new inputs must be for the same tickers')
+    self.expected_returns = np.asarray(mu, dtype='float64')
+    if isinstance(covariance_matrix, FactorRiskModel):
+      self.factor_model, self.cov_matrix = covariance_matrix, None
+    else:
+      self.factor_model = None
+      self.cov_matrix = np.asarray(covariance_matrix, dtype='float64')
+    self._hrp_order = None
+
+    if self.parametric_inputs:
+      if self.factor_model is not None:
+        self.factor_model, self.cov_matrix = None, np.asarray(
+            covariance_matrix.to_dense(), dtype='float64')
+      eigenvalues, eigenvectors = np.linalg.eigh(self.cov_matrix)
+      self._mu.value = self.expected_returns
+      self._covariance_root.value = eigenvectors * np.sqrt(
+          np.maximum(eigenvalues, 0.0))
+    else:
+      self._problems = {}
+
+    if self.factor_model is None:
+      inverse_sum = np.sum(np.linalg.pinv(self.cov_matrix))
+    else:
+      inverse_sum = self.factor_model.inverse_sum()
+    self._global_min_volatility = np.sqrt(1 / inverse_sum)
+
+  def set_weight_bounds(self, weight_bounds):
+    """
+    Accepts the weight bounds, in any form build_efficient_frontier takes
+    """
+
+    self._lower_bounds.value, self._upper_bounds.value = bound_arrays(
+        weight_bounds, len(self.tickers))
+
+  def set_gamma(self, gamma):
+    """
+    Accepts the FLOAT gamma of the L2 regularisation (0 to turn it off)
+    """
+
+    self._gamma.value = gamma
+
+  def set_risk_free_rate(self, risk_free_rate):
+    """
+    Accepts the FLOAT risk-free rate used by max_sharpe and
+    portfolio_performance
+    """
+
+    self._risk_free_rate.value = risk_free_rate
+
+  def _returns(self, w):
+    if self.parametric_inputs:
+      return self._mu @ w
+    return self.expected_returns @ w
+
+  def _variance(self, w):
+    if self.parametric_inputs:
+      return cp.sum_squares(self._covariance_root.T @ w)
+    if self.factor_model is None:
+      return cp.quad_form(w, self.cov_matrix, assume_PSD=True)
+    factor_root = self.factor_model.factor_root()
+    return (cp.sum_squares(factor_root.T @ w)
+            + cp.sum_squares(cp.multiply(
+                np.sqrt(self.factor_model.specific_variances), w)))
+
+  def _problem(self, objective):
+    if objective in self._problems:
+      return self._problems[objective]
+
+    w = self._w
+    variance = self._variance(w)
+    regularisation = self._gamma * cp.sum_squares(w)
+    constraints = [w >= self._lower_bounds, w <= self._upper_bounds,
+                   cp.sum(w) == 1]
+
+    if objective == 'min_volatility':
+      problem = cp.Problem(cp.Minimize(variance + regularisation),
+                           constraints)
+    elif objective == 'efficient_return':
+      problem = cp.Problem(cp.Minimize(variance + regularisation),
+                           constraints + [self._returns(w)
+                                          >= self._target_return])
+    elif objective == 'efficient_risk':
+      problem = cp.Problem(cp.Minimize(-self._returns(w) + regularisation),
+                           constraints + [variance <= self._target_variance])
+    else:
+      # The variable transformation of EfficientFrontier.max_sharpe: w is
+      # the weights times k, with the excess return fixed to 1
+      k = self._k
+      problem = cp.Problem(cp.Minimize(variance + regularisation),
+                           [self._returns(w)
+                            - self._risk_free_rate * cp.sum(w) == 1,
+                            cp.sum(w) == k, k >= 0,
+                            w >= self._lower_bounds * k,
+                            w <= self._upper_bounds * k])
+
+    self._problems[objective] = problem
+    return problem
+
+  def _solve(self, objective):
+    problem = self._problem(objective)
+    with span('optimize', objective=objective, session=True) as current_span:
+      try:
+        problem.solve(solver=self.solver, warm_start=True)
+      except (TypeError, cp.DCPError) as error:
+        raise exceptions.OptimizationError from error
+      self._opt = problem
+      current_span.set(**solver_stats(self))
+
+    if problem.status not in ('optimal', 'optimal_inaccurate'):
+      raise exceptions.OptimizationError(f'Solver status: {problem.status}')
+
+    weights = self._w.value
+    if objective == 'max_sharpe':
+      weights = weights / self._k.value
+    # + 0.0 removes signed zeros, like EfficientFrontier
+    self.weights = weights.round(16) + 0.0
+    return OrderedDict(zip(self.tickers, self.weights))
+
+  def max_sharpe(self, risk_free_rate=None):
+    """
+    Accepts an optional FLOAT risk-free rate, replacing the session's.
+    Returns an OrderedDict of ticker symbols and the weights maximising the
+    Sharpe ratio
+    """
+
+    if risk_free_rate is not None:
+      self.set_risk_free_rate(risk_free_rate)
+    if max(self.expected_returns) <= self._risk_free_rate.value:
+      raise ValueError('at least one of the assets must have an expected'\
+                       ' return exceeding the risk-free rate')
+    return self._solve('max_sharpe')
+
+  def min_volatility(self):
+    """
+    Returns an OrderedDict of ticker symbols and the weights minimising the
+    volatility
+    """
+
+    return self._solve('min_volatility')
+
+  def efficient_risk(self, target_volatility):
+    """
+    Accepts the FLOAT target volatility. Returns an OrderedDict of ticker
+    symbols and the weights maximising the return at that volatility
+    """
+
+    if target_volatility < self._global_min_volatility:
+      raise ValueError(f'The minimum volatility is'\
+                       f' {self._global_min_volatility:.3f}. Please use a'\
+                       ' higher target_volatility')
+    self._target_variance.value = target_volatility ** 2
+    return self._solve('efficient_risk')
+
+  def efficient_return(self, target_return):
+    """
+    Accepts the FLOAT target return. Returns an OrderedDict of ticker
+    symbols and the weights minimising the volatility at that return
+    """
+
+    weight_bounds = list(zip(self._lower_bounds.value,
+                             self._upper_bounds.value))
+    if target_return > max_feasible_return(self.expected_returns,
+                                           weight_bounds):
+      raise ValueError('target_return must be lower than the maximum'\
+                       ' possible return')
+    self._target_return.value = target_return
+    return self._solve('efficient_return')
+
+  def hrp(self, linkage_method='single'):
+    """
+    Accepts the scipy linkage method. Returns an OrderedDict of ticker
+    symbols and their Hierarchical Risk Parity weights (see hrp), computed
+    without the solver
+    """
+
+    covariance = (self.cov_matrix if self.factor_model is None
+                  else self.factor_model.to_dense().to_numpy())
+    if self._hrp_order is None or self._hrp_order[0] != linkage_method:
+      with span('cluster', assets=len(self.tickers), linkage=linkage_method):
+        self._hrp_order = (linkage_method,
+                           cluster_order(covariance, linkage_method))
+    with span('optimize', objective='hrp', session=True):
+      weights = hrp_weights(covariance, self._hrp_order[1],
+                            list(zip(self._lower_bounds.value,
+                                     self._upper_bounds.value)))
+    self._opt = None
+    self.weights = weights.round(16) + 0.0
+    return OrderedDict(zip(self.tickers, self.weights))
+
+  def portfolio_performance(self, verbose=False, risk_free_rate=None):
+    """
+    Returns a tuple of the expected annual return, the annual volatility
+    and the Sharpe ratio (at the session's risk-free rate unless another
+    is given) of the last solved portfolio
+    """
+
+    if risk_free_rate is None:
+      risk_free_rate = self._risk_free_rate.value
+    if self.factor_model is None:
+      return base_optimizer.portfolio_performance(
+          self.weights, self.expected_returns, self.cov_matrix, verbose,
+          risk_free_rate=risk_free_rate)
+
+    expected_return = float(self.weights @ self.expected_returns)
+    volatility = float(np.sqrt(self.factor_model.portfolio_variances(
+        self.weights)))
+    sharpe_ratio = (expected_return - risk_free_rate) / volatility
+    if verbose:
+      print(f'Expected annual return: {100 * expected_return:.1f}%')
+      print(f'Annual volatility: {100 * volatility:.1f}%')
+      print(f'Sharpe Ratio: {sharpe_ratio:.2f}')
+    return expected_return, volatility, sharpe_ratio
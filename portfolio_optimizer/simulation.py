@@ -0,0 +1,187 @@
+"""Monte Carlo projection.
+
+Projects the optimized portfolio forward over many simulated paths and
+reports the distribution of the outcomes: expected and median final value,
+probability of loss, value at risk and conditional value at risk (expected
+shortfall) of the final value, and the distribution of the maximum
+drawdown along the way.
+
+The portfolio is taken as rebalanced to its weights every day, so its daily
+return is w @ r and only that one series has to be simulated: with returns
+drawn from the normal distribution of mu and the covariance, it is itself
+normal with mean w @ mu and variance w @ covariance @ w (both daily). Or,
+with block_days, the paths are made of blocks of consecutive days of the
+portfolio's historical returns, which keeps their fat tails and volatility
+clustering.
+
+The paths are generated chunk_paths at a time and every chunk is reduced
+to the final return and the maximum drawdown of each of its paths before
+the next one is drawn, so the memory used does not grow with the number of
+paths times the number of days.
+"""
+
+import numpy as np
+
+from portfolio_optimizer.factor_model import FactorRiskModel
+from portfolio_optimizer.instrumentation import span
+
+CONFIDENCE_LEVELS = (0.95, 0.99)
+
+
+def portfolio_moments(weights, mu, covariance_matrix, frequency=252):
+  """
+  Accepts the weights, the annual mu and covariance matrix (or
+  FactorRiskModel) and the number of periods in a year. Returns a tuple of
+  the FLOAT mean and volatility of the portfolio's daily return.
+  """
+
+  weights = np.asarray(weights, dtype='float64')
+  if isinstance(covariance_matrix, FactorRiskModel):
+    variance = covariance_matrix.portfolio_variances(weights)
+  else:
+    variance = weights @ np.asarray(covariance_matrix, dtype='float64') \
+               @ weights
+  return (float(weights @ np.asarray(mu, dtype='float64')) / frequency,
+          float(np.sqrt(variance / frequency)))
+
+
+def historical_portfolio_returns(weights, daily_adjclose_df):
+  """
+  Accepts the weights and the price dataframe. Returns the numpy array of
+  the daily returns the portfolio would have had, rebalanced every day,
+  over the days on which every stock with a weight has a return.
+  """
+
+  weights = np.asarray(weights, dtype='float64')
+  held = weights != 0
+  prices = daily_adjclose_df.to_numpy(dtype='float64')[:, held]
+  with np.errstate(divide='ignore', invalid='ignore'):
+    returns = prices[1:] / prices[:-1] - 1
+  returns = returns[~np.isnan(returns).any(axis=1)]
+  return returns @ weights[held]
+
+
+def simulate_chunks(daily_mean, daily_volatility, paths=100_000, days=252,
+                    chunk_paths=10_000, seed=0, historical_returns=None,
+                    block_days=None):
+  """
+  Accepts the daily mean and volatility of the portfolio return, the number
+  of paths and of days, the number of paths drawn at a time, the INT seed
+  and, for the block bootstrap, the array of historical daily returns and
+  the length of the blocks. Yields, for every chunk, a dictionary of the
+  numpy arrays of the 'final_returns' and 'max_drawdowns' (as negative
+  fractions) of its paths.
+  """
+
+  rng = np.random.default_rng(seed)
+  if block_days:
+    historical_returns = np.asarray(historical_returns, dtype='float64')
+    block_days = min(int(block_days), len(historical_returns))
+    if block_days < 1:
+      raise ValueError('Need historical returns to bootstrap from')
+    n_blocks = -(-days // block_days)
+    offsets = np.arange(block_days)
+
+  for start in range(0, paths, chunk_paths):
+    n_paths = min(chunk_paths, paths - start)
+    with span('simulate_chunk', paths=n_paths, days=days):
+      if block_days:
+        first_days = rng.integers(0, len(historical_returns) - block_days + 1,
+                                  (n_paths, n_blocks))
+        growth = historical_returns[(first_days[:, :, None] + offsets)
+                                    .reshape(n_paths, -1)[:, :days]]
+      else:
+        growth = rng.normal(daily_mean, daily_volatility, (n_paths, days))
+
+      # Cumulated in place, so the chunk holds two (paths x days) arrays at
+      # most: the growth and its running peak
+      np.log1p(growth, out=growth)
+      np.cumsum(growth, axis=1, out=growth)
+      np.exp(growth, out=growth)
+      final_returns = growth[:, -1] - 1
+      # The running peak starts from the initial value of 1
+      peaks = np.maximum.accumulate(growth, axis=1)
+      np.maximum(peaks, 1.0, out=peaks)
+      np.divide(growth, peaks, out=peaks)
+      max_drawdowns = np.minimum(peaks.min(axis=1) - 1, 0.0)
+
+    yield {'final_returns': final_returns, 'max_drawdowns': max_drawdowns}
+
+
+def summarize_outcomes(final_returns, max_drawdowns, total_portfolio_value,
+                       confidence_levels=CONFIDENCE_LEVELS):
+  """
+  Accepts the arrays of the final returns and maximum drawdowns of the
+  paths, the FLOAT total portfolio value and the confidence levels of the
+  value at risk. Returns a dictionary of the outcome statistics, the value
+  at risk and conditional value at risk being positive losses in the
+  currency of the portfolio.
+  """
+
+  summary = {
+      'paths': len(final_returns),
+      'expected_final_value': total_portfolio_value
+                              * (1 + float(final_returns.mean())),
+      'median_final_value': total_portfolio_value
+                            * (1 + float(np.median(final_returns))),
+      'probability_of_loss': float((final_returns < 0).mean()),
+  }
+  for level in confidence_levels:
+    percent = f'{100 * level:g}'
+    cutoff = np.quantile(final_returns, 1 - level)
+    summary[f'value_at_risk_{percent}'] = -total_portfolio_value * float(
+        cutoff)
+    summary[f'conditional_value_at_risk_{percent}'] = \
+        -total_portfolio_value * float(final_returns[final_returns
+                                                     <= cutoff].mean())
+  summary['mean_max_drawdown'] = float(max_drawdowns.mean())
+  for percentile in (50, 95, 99):
+    summary[f'max_drawdown_p{percentile}'] = float(
+        np.percentile(max_drawdowns, 100 - percentile))
+
+  return summary
+
+
+def project_portfolio(weights, mu, covariance_matrix,
+                      total_portfolio_value=1.0, paths=100_000, days=252,
+                      chunk_paths=10_000, seed=0, daily_adjclose_df=None,
+                      block_days=None, confidence_levels=CONFIDENCE_LEVELS):
+  """
+  Accepts the weights (a dictionary of tickers, in the order of mu, or an
+  array), mu and the covariance matrix (or FactorRiskModel), the FLOAT
+  total portfolio value and the simulation settings of simulate_chunks;
+  with block_days, the paths are bootstrapped from the price dataframe
+  instead. Returns the dictionary of summarize_outcomes, plus the number
+  of 'days' and the 'method'.
+  """
+
+  if isinstance(weights, dict):
+    weights = [weights.get(ticker, 0.0) for ticker in mu.index]
+  weights = np.asarray(weights, dtype='float64')
+
+  historical_returns = None
+  if block_days:
+    if daily_adjclose_df is None:
+      raise ValueError('The block bootstrap needs the price dataframe')
+    historical_returns = historical_portfolio_returns(weights,
+                                                      daily_adjclose_df)
+  daily_mean, daily_volatility = portfolio_moments(weights, mu,
+                                                   covariance_matrix)
+
+  final_returns = np.empty(paths)
+  max_drawdowns = np.empty(paths)
+  filled = 0
+  with span('project_portfolio', paths=paths, days=days,
+            bootstrap=bool(block_days)):
+    for chunk in simulate_chunks(daily_mean, daily_volatility, paths, days,
+                                 chunk_paths, seed, historical_returns,
+                                 block_days):
+      n_paths = len(chunk['final_returns'])
+      final_returns[filled:filled + n_paths] = chunk['final_returns']
+      max_drawdowns[filled:filled + n_paths] = chunk['max_drawdowns']
+      filled += n_paths
+
+  return {'days': days,
+          'method': 'block_bootstrap' if block_days else 'normal',
+          **summarize_outcomes(final_returns, max_drawdowns,
+                               total_portfolio_value, confidence_levels)}
@@ -0,0 +1,59 @@
+"""Synthetic price data.
+
+Generates correlated daily price panels, and writes them out as price
+files LocalFileBackend can read, for benchmarks and tests that must not
+depend on the network.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+
+def synthetic_prices(n_assets, years, n_factors=3, seed=0,
+                     start_date='2000-01-03'):
+  """
+  Accepts the number of assets, the number of years of daily bars and,
+  optionally, the number of common factors driving the returns and a random
+  seed. Returns a pandas dataframe of positive, correlated daily prices
+  (one column per ticker 'S0000', 'S0001'...) on business days.
+  """
+
+  rng = np.random.default_rng(seed)
+  n_days = int(round(years * 252)) + 1
+  dates = pd.bdate_range(start_date, periods=n_days, name='Date')
+  tickers = [f'S{asset:04d}' for asset in range(n_assets)]
+
+  # Daily returns = drift + factor loadings @ factor returns + specific noise
+  loadings = rng.normal(0.6, 0.3, size=(n_assets, n_factors))
+  factor_returns = rng.normal(0.0, 0.01, size=(n_days - 1, n_factors))
+  specific_volatility = rng.uniform(0.005, 0.02, size=n_assets)
+  drift = rng.normal(0.0003, 0.0003, size=n_assets)
+  returns = (drift + factor_returns @ loadings.T
+             + rng.standard_normal((n_days - 1, n_assets))
+             * specific_volatility)
+
+  starting_prices = rng.uniform(10, 500, size=n_assets)
+  prices = np.vstack([starting_prices,
+                      starting_prices * np.cumprod(1 + returns, axis=0)])
+
+  return pd.DataFrame(prices, index=dates, columns=tickers)
+
+
+def write_price_fixture(daily_adjclose_df, directory, file_format='csv'):
+  """
+  Accepts a price dataframe, a directory and 'csv' or 'parquet'. Writes one
+  '<TICKER>.<file_format>' file per column with 'Date' and 'Adj Close'
+  columns, the layout LocalFileBackend reads.
+  """
+
+  os.makedirs(directory, exist_ok=True)
+  for ticker in daily_adjclose_df.columns:
+    price_df = daily_adjclose_df[[ticker]].rename(columns={ticker: 'Adj Close'})
+    price_df.index.name = 'Date'
+    path = os.path.join(directory, f'{ticker}.{file_format}')
+    if file_format == 'parquet':
+      price_df.to_parquet(path)
+    else:
+      price_df.to_csv(path)
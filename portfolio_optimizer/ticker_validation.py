@@ -0,0 +1,162 @@
+"""Ticker validation.
+
+Checks whole lists of ticker symbols against a locally cached symbol master
+and only asks Yahoo! Finance about the symbols it has never seen before.
+"""
+
+import io
+import json
+import os
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+DEFAULT_SYMBOLS_PATH = os.path.join(os.path.expanduser('~'),
+                                    '.portfolio_optimizer', 'symbols.json')
+
+# Symbol directories of every security listed on American exchanges
+SYMBOL_DIRECTORY_URLS = (
+    'https://www.nasdaqtrader.com/dynamic/SymDir/nasdaqlisted.txt',
+    'https://www.nasdaqtrader.com/dynamic/SymDir/otherlisted.txt',
+)
+
+
+def yahoo_ticker_exists(security):
+  """
+  Accepts a ticker symbol and checks with Yahoo! Finance whether it exists,
+  the same way the calculator always did. Returns a BOOL
+  """
+
+  import yfinance as yf
+
+  try:
+    yf.Ticker(security).info['longBusinessSummary']
+  except KeyError:
+    return False
+  return True
+
+
+def read_symbol_file(path_or_url):
+  """
+  Accepts the path (or URL) of a symbol master file: either one symbol per
+  line, or a comma/pipe delimited table with a 'Symbol' or 'ACT Symbol'
+  column. Returns a SET of upper case symbols
+  """
+
+  if path_or_url.startswith(('http://', 'https://')):
+    with urllib.request.urlopen(path_or_url) as response:
+      text = response.read().decode()
+  else:
+    with open(path_or_url) as symbol_file:
+      text = symbol_file.read()
+
+  first_line = text.split('\n', 1)[0]
+  for delimiter in ('|', ','):
+    if delimiter in first_line:
+      symbol_df = pd.read_csv(io.StringIO(text), sep=delimiter, dtype=str)
+      column = 'Symbol' if 'Symbol' in symbol_df.columns else 'ACT Symbol'
+      symbols = symbol_df[column]
+      break
+  else:
+    symbols = pd.Series(text.split())
+
+  return {symbol.strip().upper() for symbol in symbols.dropna()
+          if symbol.strip()}
+
+
+class TickerValidator:
+  """
+  Validates ticker symbols against a symbol master (the set of known valid
+  symbols) and a negative cache (symbols known to be invalid), both kept
+  in a JSON file. Symbols found in neither are checked remotely and
+  concurrently, and the answers are cached so they are never asked again.
+  """
+
+  def __init__(self, path=DEFAULT_SYMBOLS_PATH, remote_check=None,
+               max_workers=8):
+    self.path = path
+    self.remote_check = remote_check or yahoo_ticker_exists
+    self.max_workers = max_workers
+    self.valid_symbols = set()
+    self.invalid_symbols = set()
+    self.refreshed_at = None
+
+    if path and os.path.exists(path):
+      with open(path) as symbols_file:
+        symbols = json.load(symbols_file)
+      self.valid_symbols = set(symbols['valid'])
+      self.invalid_symbols = set(symbols['invalid'])
+      self.refreshed_at = symbols.get('refreshed_at')
+
+  def save(self):
+    """
+    Writes the symbol master and the negative cache back to the JSON file.
+    """
+
+    directory = os.path.dirname(self.path)
+    if directory:
+      os.makedirs(directory, exist_ok=True)
+    with open(self.path, 'w') as symbols_file:
+      json.dump({'valid': sorted(self.valid_symbols),
+                 'invalid': sorted(self.invalid_symbols),
+                 'refreshed_at': self.refreshed_at}, symbols_file)
+
+  def refresh(self, sources=SYMBOL_DIRECTORY_URLS):
+    """
+    Accepts a LIST of symbol master files or URLs (the American exchange
+    symbol directories by default) and replaces the symbol master with the
+    symbols they list. The negative cache is cleared, since symbols that
+    were invalid may have been listed since.
+    """
+
+    valid_symbols = set()
+    for source in sources:
+      valid_symbols |= read_symbol_file(source)
+
+    self.valid_symbols = valid_symbols
+    self.invalid_symbols = set()
+    self.refreshed_at = time.time()
+    self.save()
+
+  def validate(self, securities):
+    """
+    Accepts a LIST of ticker symbols. Returns a tuple of three LISTs: the
+    valid, the invalid and the unchecked symbols (whose remote check
+    failed, e.g. during a network outage), upper cased and in the order
+    given.
+    """
+
+    securities = [security.upper() for security in securities]
+    unknown_symbols = list(dict.fromkeys(
+        security for security in securities
+        if security not in self.valid_symbols
+        and security not in self.invalid_symbols))
+
+    unchecked_symbols = set()
+    if unknown_symbols:
+      max_workers = max(1, min(self.max_workers, len(unknown_symbols)))
+      with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(self.remote_check, security)
+                   for security in unknown_symbols]
+        for security, future in zip(unknown_symbols, futures):
+          try:
+            exists = future.result()
+          except Exception:
+            # A network failure says nothing about the symbol, don't cache it
+            unchecked_symbols.add(security)
+            continue
+          if exists:
+            self.valid_symbols.add(security)
+          else:
+            self.invalid_symbols.add(security)
+
+    valid = [security for security in securities
+             if security in self.valid_symbols]
+    invalid = [security for security in securities
+               if security in self.invalid_symbols]
+    unchecked = [security for security in securities
+                 if security in unchecked_symbols]
+
+    return valid, invalid, unchecked